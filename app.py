@@ -1,14 +1,24 @@
-import requests
 import json
 import time
+import hashlib
+import re
+import unicodedata
 from datetime import datetime
 import os
+import sys
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-import pandas as pd
 import base64 # <-- VUELVE
 from streamlit.components.v1 import html # <-- VUELVE
 # import pydeck as pdk <-- ELIMINADO (ya no hay mapa)
 from streamlit_autorefresh import st_autorefresh # Para auto-refresh
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+# requests y pandas se importan de forma diferida (dentro de las funciones que los usan)
+# para que el layout se pinte antes de pagar su coste de importación.
+
+logger = logging.getLogger(__name__)
 
 # --- CONFIGURACIÓN DE PÁGINA (¡DEBE SER LO PRIMERO!) ---
 st.set_page_config(layout="wide", page_title="Gemelos Digitales de Flota")
@@ -42,22 +52,42 @@ st.markdown("""
 
 
 # --- CONFIGURACIÓN GENERAL ---
-try:
-    SAMSARA_API_TOKEN = st.secrets["SAMSARA_API_TOKEN"]
-except KeyError:
-    st.error("Error: La clave 'SAMSARA_API_TOKEN' no se encontró en los secretos de Streamlit. "
-             "Por favor, configura tu token de Samsara en .streamlit/secrets.toml.")
+# Varias organizaciones de Samsara: una tabla [SAMSARA_ORGS] en secrets.toml con
+# nombre = "token". Si no existe, se usa el token único SAMSARA_API_TOKEN.
+def load_org_tokens():
+    """
+    Devuelve una tupla ordenada de (nombre_org, token).
+    """
+    orgs_config = st.secrets.get("SAMSARA_ORGS")
+    if orgs_config:
+        return tuple(sorted((str(name), str(token)) for name, token in orgs_config.items()))
+    token = st.secrets.get("SAMSARA_API_TOKEN")
+    if token:
+        return (("principal", str(token)),)
+    return ()
+
+SAMSARA_ORG_TOKENS = load_org_tokens()
+if not SAMSARA_ORG_TOKENS:
+    st.error("Error: No se encontró 'SAMSARA_API_TOKEN' ni la tabla 'SAMSARA_ORGS' en los secretos de Streamlit. "
+             "Por favor, configura tu(s) token(s) de Samsara en .streamlit/secrets.toml.")
     st.stop()
 
+# Presupuesto de peticiones por segundo para CADA token (cada org tiene su propio límite en Samsara)
+SAMSARA_REQUESTS_PER_SECOND = float(st.secrets.get("SAMSARA_REQUESTS_PER_SECOND", 20))
+
 # Usaremos un mapa que no requiere token, pero dejamos la variable por si se quiere usar Mapbox en el futuro.
 MAPBOX_API_TOKEN = st.secrets.get("MAPBOX_API_TOKEN", None)
 
 
-BASE_URL = "https://api.samsara.com/fleet"
-HEADERS = {
-    "Authorization": f"Bearer {SAMSARA_API_TOKEN}",
-    "Content-Type": "application/json"
-}
+# La raíz de la API se puede sobrescribir (ej. un servidor mock para benchmarks)
+SAMSARA_API_ROOT = os.environ.get("SAMSARA_API_ROOT", "https://api.samsara.com").rstrip("/")
+BASE_URL = f"{SAMSARA_API_ROOT}/fleet"
+MAINTENANCE_URL = f"{SAMSARA_API_ROOT}/v1/fleet/maintenance/list"
+
+# Campos que el gemelo usa de cada endpoint: el resto de cada página no se materializa
+ROSTER_FIELDS = ('id', 'name', 'make', 'model', 'year', 'licensePlate')
+LOCATION_FIELDS = ('id', 'location')
+MAINTENANCE_FIELDS = ('id', 'j1939.checkEngineLight', 'j1939.diagnosticTroubleCodes')
 
 # --- ¡VUELVE! Mapa de Modelos 3D ---
 # Asocia el string del 'modelo' de Samsara con tu archivo .glb
@@ -73,32 +103,251 @@ MODEL_MAP = {
     "default": "truck5.glb" # ¡Asegúrate de tener esta imagen!
 }
 
+# Carpeta de las rutas de MODEL_MAP (por defecto, el directorio de trabajo); se
+# puede sobrescribir, ej. con modelos de prueba en benchmarks/load_test.py
+MODEL_ASSETS_ROOT = os.environ.get("MODEL_ASSETS_ROOT", "")
+
+
+# --- RESOLUCIÓN DE MODELOS 3D (una vez por carga del roster, O(1) por vista) ---
+def normalize_model_name(text):
+    """
+    Normaliza marca/modelo para comparar: minúsculas, sin acentos y sin signos.
+    'Cascadia-126 ' -> 'cascadia 126'
+    """
+    text = unicodedata.normalize('NFKD', str(text or '')).encode('ascii', 'ignore').decode('ascii')
+    return " ".join(re.sub(r'[^a-z0-9]+', ' ', text.lower()).split())
+
+
+def model_map_signature(model_map):
+    """
+    Huella de MODEL_MAP: si cambia, hay que volver a resolver los modelos de la flota.
+    """
+    return hashlib.sha256(json.dumps(sorted(model_map.items())).encode('utf-8')).hexdigest()
+
+
+def build_model_index(model_map):
+    """
+    Índice de claves normalizadas -> archivo. Las claves más largas van primero
+    (la coincidencia más específica gana); a igual longitud, orden alfabético.
+    """
+    entries = [(normalize_model_name(key), path) for key, path in model_map.items() if key != "default"]
+    entries = [(key, path) for key, path in entries if key]
+    exact = dict(entries)
+    by_length = sorted(entries, key=lambda entry: (-len(entry[0]), entry[0]))
+    return exact, by_length
+
+
+def resolve_model_asset(make, model, model_index, default_path):
+    """
+    Archivo .glb para una marca/modelo:
+    1. coincidencia exacta con el modelo, 2. clave más larga contenida en el modelo,
+    3. clave más larga contenida en 'marca modelo', 4. modelo por defecto.
+    """
+    exact, by_length = model_index
+    model_name = normalize_model_name(model)
+    if model_name in exact:
+        return exact[model_name]
+    for candidate in (model_name, normalize_model_name(f"{make} {model}")):
+        if not candidate:
+            continue
+        for key, path in by_length:
+            if key in candidate:
+                return path
+    return default_path
+
+
+def resolve_fleet_models(rosters, model_map):
+    """
+    Resuelve en bloque el modelo 3D de toda la flota: {vehicle_id con org: archivo .glb}.
+    """
+    model_index = build_model_index(model_map)
+    default_path = model_map.get("default", "truck5.glb")
+    resolved_by_name = {}  # Muchas unidades comparten marca/modelo
+    model_assets = {}
+    for org_name, vehicle_details in rosters.items():
+        for details in vehicle_details:
+            make_model = (details.get('make') or '', details.get('model') or '')
+            if make_model not in resolved_by_name:
+                resolved_by_name[make_model] = resolve_model_asset(*make_model, model_index, default_path)
+            model_assets[scoped_vehicle_id(org_name, details.get('id'))] = resolved_by_name[make_model]
+    return model_assets
+
+
+# --- Intervalos de servicio por marca/modelo ---
+# Mismas reglas de búsqueda que MODEL_MAP (exacto, clave más larga, "default").
+# Cada métrica es opcional: si falta o es None, esa métrica no programa servicios.
+SERVICE_INTERVALS = {
+    "Cascadia": {'engine_hours': 500, 'odometer_km': 40000},
+    "T680": {'engine_hours': 500, 'odometer_km': 40000},
+    "VNL": {'engine_hours': 600, 'odometer_km': 55000},
+    # ... añade más modelos aquí ...
+
+    "default": {'engine_hours': 500, 'odometer_km': 25000},
+}
+USAGE_HALF_LIFE_DAYS = 14    # Peso de las lecturas viejas en la tasa de uso (vida media)
+DUE_SOON_DAYS = 30           # Horizonte de la lista "Mantenimiento Próximo"
+
+
+def resolve_fleet_service_intervals(rosters, service_intervals):
+    """
+    Resuelve en bloque el intervalo de servicio de toda la flota.
+    Devuelve (vehicle_ids con org, {'engine_hours': [...], 'odometer_km': [...]}).
+    """
+    interval_index = build_model_index(service_intervals)
+    default_intervals = service_intervals.get("default") or {}
+    resolved_by_name = {}
+    vehicle_ids = []
+    intervals = {'engine_hours': [], 'odometer_km': []}
+    for org_name, vehicle_details in rosters.items():
+        for details in vehicle_details:
+            make_model = (details.get('make') or '', details.get('model') or '')
+            if make_model not in resolved_by_name:
+                resolved_by_name[make_model] = resolve_model_asset(*make_model, interval_index, default_intervals)
+            vehicle_ids.append(scoped_vehicle_id(org_name, details.get('id')))
+            for metric, values in intervals.items():
+                value = resolved_by_name[make_model].get(metric)
+                values.append(float(value) if isinstance(value, (int, float)) else float('nan'))
+    return vehicle_ids, intervals
+
+
+# --- ARRANQUE RÁPIDO: SNAPSHOT EN DISCO ---
+# El último estado de la flota se persiste en disco para poder pintar el dashboard
+# inmediatamente al arrancar; los datos frescos se cargan en segundo plano.
+SNAPSHOT_PATH = os.environ.get("FLEET_SNAPSHOT_PATH", os.path.join(".cache", "fleet_snapshot.json"))
+ROSTER_TTL_SECONDS = 3600    # Lista de vehículos: 1 hora
+TELEMETRY_TTL_SECONDS = 55   # Datos dinámicos: 55 segundos
+# Estado del pronóstico de mantenimiento (sumas del ajuste de tasas de uso), junto al snapshot
+USAGE_MODEL_PATH = f"{os.path.splitext(SNAPSHOT_PATH)[0]}_uso.npz"
+
+
+# --- Cargar las definiciones de DTCs (diferido, solo cuando hay DTCs que mostrar) ---
+@st.cache_resource(show_spinner=False)
+def load_dtc_definitions():
+    """
+    Carga dtc_definitions.json una sola vez por proceso.
+    """
+    try:
+        with open("dtc_definitions.json", "r", encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        st.warning("Advertencia: El archivo 'dtc_definitions.json' no se encontró. Las descripciones de DTCs no estarán disponibles.")
+    except json.JSONDecodeError:
+        st.error("Error: El archivo 'dtc_definitions.json' está mal formateado. No se pudieron cargar las descripciones de DTCs.")
+    except Exception as e:
+        st.error(f"Error inesperado al cargar dtc_definitions.json: {e}")
+    return {}
+
+
+# --- MENSAJES DESDE LAS FUNCIONES DE API ---
+# Las funciones de API pueden ejecutarse en el hilo de precarga, donde no hay sesión
+# de Streamlit. En ese caso los mensajes se guardan y se muestran con el snapshot.
+_fetch_context = threading.local()
+
+def notify(level, message):
+    """
+    Muestra un mensaje ('info', 'warning', 'error') en la UI o lo registra si no hay sesión.
+    """
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        getattr(st, level)(message)
+        return
+    logger.log(logging.ERROR if level == 'error' else logging.WARNING, message)
+    issues = getattr(_fetch_context, 'issues', None)
+    if issues is not None:
+        issues.append({'level': level, 'message': message})
+
+
+# --- ORGANIZACIONES: CLIENTE HTTP Y LÍMITE DE PETICIONES POR TOKEN ---
+class RateLimiter:
+    """
+    Limitador por intervalo mínimo entre peticiones (seguro entre hilos).
+    """
+
+    def __init__(self, requests_per_second):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SamsaraOrg:
+    """
+    Una organización de Samsara: su token, su presupuesto de peticiones y su sesión HTTP.
+    """
+    MAX_RETRIES_ON_429 = 3
+
+    def __init__(self, name, token, requests_per_second=SAMSARA_REQUESTS_PER_SECOND):
+        self.name = name
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip"
+        }
+        self.limiter = RateLimiter(requests_per_second)
+        self.roster_loaded_at = 0.0  # Cuándo se cargó por última vez la lista de vehículos de esta org
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=10, stream=True):
+        """
+        GET respetando el límite de la org; reintenta tras un 429 usando Retry-After.
+        Por defecto en streaming: el cuerpo se decodifica con samsara_json.decode_page.
+        """
+        import requests
+
+        with self._session_lock:
+            if self._session is None:
+                self._session = requests.Session()
+                self._session.headers.update(self.headers)
+        for attempt in range(self.MAX_RETRIES_ON_429 + 1):
+            self.limiter.wait()
+            response = self._session.get(url, params=params, timeout=timeout, stream=stream)
+            if response.status_code != 429 or attempt == self.MAX_RETRIES_ON_429:
+                return response
+            response.close()
+            try:
+                retry_after = float(response.headers.get("Retry-After", 1))
+            except ValueError:
+                retry_after = 1.0
+            time.sleep(retry_after)
+        return response
+
 
-# --- Cargar las definiciones de DTCs ---
-DTC_DEFINITIONS = {}
-try:
-    with open("dtc_definitions.json", "r", encoding='utf-8') as f:
-        DTC_DEFINITIONS = json.load(f)
-except FileNotFoundError:
-    st.warning("Advertencia: El archivo 'dtc_definitions.json' no se encontró. Las descripciones de DTCs no estarán disponibles.")
-except json.JSONDecodeError:
-    st.error("Error: El archivo 'dtc_definitions.json' está mal formateado. No se pudieron cargar las descripciones de DTCs.")
-except Exception as e:
-    st.error(f"Error inesperado al cargar dtc_definitions.json: {e}")
+def run_concurrently(tasks):
+    """
+    Ejecuta los callables en paralelo y devuelve sus resultados en orden.
+    Los hilos heredan la lista de mensajes del hilo que los lanza (ver notify).
+    """
+    if not tasks:
+        return []
+    issues = getattr(_fetch_context, 'issues', None)
+
+    def run(task):
+        _fetch_context.issues = issues
+        try:
+            return task()
+        finally:
+            _fetch_context.issues = None
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        return list(pool.map(run, tasks))
 
 
 # --- FUNCIÓN PARA OBTENER *TODOS* LOS VEHÍCULOS ---
-@st.cache_data(ttl=3600, show_spinner=False) # Cachear por 1 hora, SIN SPINNER
-def get_all_vehicle_details_list():
+# Sin @st.cache_data: la frescura (1 hora) la controla FleetSnapshotStore.
+def get_all_vehicle_details_list(org):
     """
-    Obtiene la lista completa de vehículos (ID, nombre, etc.) de la flota.
+    Obtiene la lista completa de vehículos (ID, nombre, etc.) de la flota de una org.
     """
-    # ¡NUEVO! Solo mostrar spinners/mensajes en la carga inicial
-    show_messages = 'initial_load_complete' not in st.session_state or not st.session_state.initial_load_complete
-    
-    if show_messages:
-        st.info("Obteniendo lista completa de vehículos de la flota...")
-        
+    import requests
+    from samsara_json import decode_page
+
     endpoint = f"{BASE_URL}/vehicles"
     all_vehicles = []
     next_cursor = None
@@ -110,99 +359,68 @@ def get_all_vehicle_details_list():
             params['after'] = next_cursor
 
         try:
-            response = requests.get(endpoint, headers=HEADERS, params=params, timeout=10)
+            response = org.get(endpoint, params=params, timeout=10)
             response.raise_for_status()
-            data = response.json()
-            
-            current_page_vehicles = data.get('data', [])
+            current_page_vehicles, next_cursor = decode_page(response, ('data',), ROSTER_FIELDS)
             all_vehicles.extend(current_page_vehicles)
             
-            pagination = data.get('pagination', {})
-            next_cursor = pagination.get('endCursor')
-            
             if not next_cursor:
                 break # Salir del bucle si no hay más páginas
             
             page += 1
 
         except requests.exceptions.RequestException as e:
-            st.error(f"Error al obtener la lista de vehículos (Página {page}): {e}")
+            notify('error', f"[{org.name}] Error al obtener la lista de vehículos (Página {page}): {e}")
             break # Salir del bucle en caso de error
 
-    if show_messages:
-        st.success(f"¡Lista de flota obtenida! Se encontraron {len(all_vehicles)} vehículos.")
-        
     return all_vehicles
 
 
 # --- Función para obtener datos de MÚLTIPLES vehículos (OPTIMIZADA) ---
-@st.cache_data(ttl=55, show_spinner=False) # TTL más corto (55s), SIN SPINNER
-def fetch_samsara_data_multiple_vehicles(vehicle_ids_to_fetch):
+# Sin @st.cache_data: la frescura (55s) la controla FleetSnapshotStore.
+def fetch_samsara_data_multiple_vehicles(org, vehicle_ids_to_fetch):
     
-    # Mapas para almacenar los datos dinámicos
-    all_vehicle_locations = {}
-    all_vehicle_stats_map = {}
-    all_vehicle_maintenance_map = {}
-
     if not vehicle_ids_to_fetch:
-        st.warning("No se proporcionaron IDs de vehículos para buscar datos.")
+        notify('warning', f"[{org.name}] No se proporcionaron IDs de vehículos para buscar datos.")
         return {}, {}, {}
 
-    # --- 1. Obtener Ubicaciones (Optimizado) ---
-    all_vehicle_locations = get_vehicle_locations(vehicle_ids_to_fetch)
-    if not all_vehicle_locations:
-        st.warning("No se pudieron obtener datos de ubicación.")
-
-    # --- 2. Obtener Mantenimiento (Optimizado) ---
-    all_vehicle_maintenance_map = get_all_vehicle_maintenance_data(vehicle_ids_to_fetch)
-    if not all_vehicle_maintenance_map:
-        st.warning("No se pudieron obtener datos de mantenimiento (DTCs).")
-
-    # --- 3. Obtener Estadísticas (Optimizado) ---
     all_desired_stat_types = [
         'engineCoolantTemperatureMilliC',
         'ambientAirTemperatureMilliC',
         'engineRpm',
         'obdEngineSeconds',
-        'engineOilPressureKPa'
+        'engineOilPressureKPa',
+        'gpsOdometerMeters'
     ]
-    all_vehicle_stats_map = get_stats_for_multiple_vehicles(vehicle_ids_to_fetch, all_desired_stat_types)
+
+    # Ubicaciones, mantenimiento y estadísticas son independientes: se piden en paralelo
+    # (todas comparten el límite de peticiones de la org)
+    all_vehicle_locations, all_vehicle_maintenance_map, all_vehicle_stats_map = run_concurrently([
+        lambda: get_vehicle_locations(org, vehicle_ids_to_fetch),
+        lambda: get_all_vehicle_maintenance_data(org, vehicle_ids_to_fetch),
+        lambda: get_stats_for_multiple_vehicles(org, vehicle_ids_to_fetch, all_desired_stat_types),
+    ])
+
+    if not all_vehicle_locations:
+        notify('warning', f"[{org.name}] No se pudieron obtener datos de ubicación.")
+    if not all_vehicle_maintenance_map:
+        notify('warning', f"[{org.name}] No se pudieron obtener datos de mantenimiento (DTCs).")
     if not all_vehicle_stats_map:
-        st.warning("No se pudieron obtener estadísticas del motor.")
+        notify('warning', f"[{org.name}] No se pudieron obtener estadísticas del motor.")
 
     # Devolvemos los mapas llenos
     return all_vehicle_locations, all_vehicle_stats_map, all_vehicle_maintenance_map
 
 
-# --- Función para obtener datos de UN SOLO vehículo (OPTIMIZADA) ---
-@st.cache_data(ttl=55, show_spinner=False) # TTL corto, SIN SPINNER
-def fetch_samsara_data_single_vehicle(vehicle_id_to_fetch):
-    vehicle_locations = {}
-    vehicle_stats = {}
-    vehicle_maintenance_data = {}
-
-    # Usar las funciones optimizadas de lote, pero solo con un ID
-    vehicle_locations = get_vehicle_locations([vehicle_id_to_fetch])
-    vehicle_maintenance_data = get_all_vehicle_maintenance_data([vehicle_id_to_fetch])
-    
-    all_desired_stat_types = [
-        'engineCoolantTemperatureMilliC',
-        'ambientAirTemperatureMilliC',
-        'engineRpm',
-        'obdEngineSeconds',
-        'engineOilPressureKPa'
-    ]
-    vehicle_stats = get_stats_for_multiple_vehicles([vehicle_id_to_fetch], all_desired_stat_types)
-
-    return vehicle_locations, vehicle_stats, vehicle_maintenance_data
-
-
 # --- FUNCIONES DE API AUXILIARES (Optimizadas) ---
 
-def get_vehicle_locations(vehicle_ids):
+def get_vehicle_locations(org, vehicle_ids):
     """
     Obtiene ubicaciones para una lista de IDs de vehículos.
     """
+    import requests
+    from samsara_json import decode_page
+
     endpoint = f"{BASE_URL}/vehicles/locations"
     
     # La API de ubicaciones puede manejar múltiples IDs, pero a veces falla si son demasiados.
@@ -216,23 +434,27 @@ def get_vehicle_locations(vehicle_ids):
         params = {'ids': ids_str}
         
         try:
-            response = requests.get(endpoint, headers=HEADERS, params=params, timeout=10)
+            response = org.get(endpoint, params=params, timeout=10)
             response.raise_for_status()
-            locations_data = response.json().get('data', [])
+            locations_data, _ = decode_page(response, ('data',), LOCATION_FIELDS)
             
             for loc in locations_data:
                 locations_map[loc['id']] = loc['location']
                 
         except requests.exceptions.RequestException as e:
-            st.warning(f"ERROR_LOG: Error al obtener lote de ubicaciones: {e}")
+            notify('warning', f"ERROR_LOG: [{org.name}] Error al obtener lote de ubicaciones: {e}")
             continue # Continuar con el siguiente lote
             
     return locations_map
 
-def get_stats_for_multiple_vehicles(vehicle_ids, stat_types):
+def get_stats_for_multiple_vehicles(org, vehicle_ids, stat_types):
     """
     Obtiene estadísticas para múltiples vehículos en lotes.
+    Devuelve {vehicle_id: {stat_type: valor, 'times': {stat_type: hora ISO de la lectura}}}
     """
+    import requests
+    from samsara_json import decode_page
+
     stats_map = {vid: {} for vid in vehicle_ids}
     endpoint = f"{BASE_URL}/vehicles/stats"
     
@@ -252,9 +474,9 @@ def get_stats_for_multiple_vehicles(vehicle_ids, stat_types):
                     "types": ",".join(batch_of_types),
                     "vehicleIds": batch_ids_str # ¡Clave de la optimización!
                 }
-                response = requests.get(endpoint, headers=HEADERS, params=params, timeout=15)
+                response = org.get(endpoint, params=params, timeout=15)
                 response.raise_for_status()
-                data = response.json().get('data', [])
+                data, _ = decode_page(response, ('data',), ('id', *batch_of_types))
 
                 # Organizar los datos en el mapa
                 for item in data:
@@ -264,22 +486,31 @@ def get_stats_for_multiple_vehicles(vehicle_ids, stat_types):
                             if stat_type in item:
                                 if isinstance(item[stat_type], dict) and 'value' in item[stat_type]:
                                     stats_map[vehicle_id][stat_type] = item[stat_type]['value']
+                                    # Hora de la lectura (no la de la consulta), para el pronóstico
+                                    stats_map[vehicle_id].setdefault('times', {})[stat_type] = item[stat_type].get('time')
                                 else:
                                     stats_map[vehicle_id][stat_type] = item[stat_type]
             
         except requests.exceptions.RequestException as e:
-            st.error(f"ERROR_LOG: Fallo al obtener stats por lotes: {e}")
+            notify('error', f"ERROR_LOG: [{org.name}] Fallo al obtener stats por lotes: {e}")
             continue # Continuar con el siguiente lote de IDs
             
     return stats_map
 
 
-def get_all_vehicle_maintenance_data(target_vehicle_ids):
+def get_all_vehicle_maintenance_data(org, target_vehicle_ids):
     """
     Obtiene todos los datos de mantenimiento y los filtra por los IDs objetivo.
     Devuelve un MAPA {vehicle_id: maintenance_data}
+
+    Las páginas se decodifican completas: se pide el mantenimiento de todo el roster
+    de la org, así que casi no hay vehículos que saltar y el streaming de
+    samsara_json (stream=True) sería varias veces más lento.
     """
-    endpoint = "https://api.samsara.com/v1/fleet/maintenance/list"
+    import requests
+    from samsara_json import decode_page
+
+    endpoint = MAINTENANCE_URL
     next_cursor = None
     page_count = 0
     
@@ -294,13 +525,13 @@ def get_all_vehicle_maintenance_data(target_vehicle_ids):
             params['after'] = next_cursor
 
         try:
-            response = requests.get(endpoint, headers=HEADERS, params=params, timeout=10)
+            response = org.get(endpoint, params=params, timeout=10)
             response.raise_for_status()
-            response_data = response.json()
-            
-            current_page_items = response_data.get('vehicleMaintenance', [])
-            if not current_page_items:
-                current_page_items = response_data.get('vehicles', [])
+            # Solo se conservan los campos del gemelo de los vehículos de target_id_set
+            current_page_items, next_cursor = decode_page(
+                response, ('vehicleMaintenance', 'vehicles'), MAINTENANCE_FIELDS,
+                keep_item=lambda item_id: str(item_id) in target_id_set
+            )
 
             # Filtrar solo los vehículos que necesitamos EN ESTA PÁGINA
             for vehicle_item in current_page_items:
@@ -309,20 +540,29 @@ def get_all_vehicle_maintenance_data(target_vehicle_ids):
                     maintenance_map[vehicle_id] = vehicle_item
                     target_id_set.remove(vehicle_id) # Dejamos de buscarlo
 
-            pagination_info = response_data.get('pagination', {})
-            next_cursor = pagination_info.get('endCursor')
-
             # Si ya encontramos todos o no hay más páginas, salimos
             if not next_cursor or not target_id_set:
                 break
                 
         except requests.exceptions.RequestException as e:
-            st.error(f"ERROR_LOG: Fallo al obtener datos de mantenimiento (Página {page_count}): {e}")
+            notify('error', f"ERROR_LOG: [{org.name}] Fallo al obtener datos de mantenimiento (Página {page_count}): {e}")
             return {} # Devolver mapa vacío en caso de error
 
     return maintenance_map # Devolvemos el mapa filtrado
 
 
+def parse_samsara_time(text):
+    """
+    Hora ISO 8601 de Samsara ('2026-01-01T00:00:00Z') a segundos epoch; None si no es válida.
+    """
+    if not isinstance(text, str):
+        return None
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
 # --- LÓGICA DEL GEMELO DIGITAL Y DETECCIÓN DE ALERTA ---
 def process_vehicle_data(vehicle_details, vehicle_locations, vehicle_stats, vehicle_maintenance_data):
     
@@ -338,6 +578,8 @@ def process_vehicle_data(vehicle_details, vehicle_locations, vehicle_stats, vehi
         'latitude': 'N/A', 'longitude': 'N/A', 'speed_mph': 'N/A', 'current_address': 'N/A',
         'gps_odometer_meters': 'N/A', 'location_updated_at': 'N/A',
         'engine_hours': 'N/A',
+        'engine_hours_read_at': None, 'odometer_read_at': None,  # Segundos epoch de cada lectura
+        'service_due_days': 'N/A',  # Lo rellena el pronóstico de mantenimiento
         'fuel_perc_remaining': 'N/A',
         'engine_oil_pressure_kpa': 'N/A',
         'engine_coolant_temperature_c': 'N/A',
@@ -377,9 +619,23 @@ def process_vehicle_data(vehicle_details, vehicle_locations, vehicle_stats, vehi
             gemelo_digital['location_updated_at'] = 'N/A'
 
 
+    # Odómetro: estadística de Samsara o, si no viene, el de la ubicación
+    stat_times = stats_data.get('times', {})
+    odometer_meters = stats_data.get('gpsOdometerMeters')
+    odometer_time = stat_times.get('gpsOdometerMeters')
+    if not isinstance(odometer_meters, (int, float)) and loc_data:
+        odometer_meters = loc_data.get('gpsOdometerMeters')
+        odometer_time = loc_data.get('time')
+    if isinstance(odometer_meters, (int, float)):
+        gemelo_digital['gps_odometer_meters'] = round(odometer_meters)
+        gemelo_digital['odometer_read_at'] = parse_samsara_time(odometer_time)
+    else:
+        gemelo_digital['gps_odometer_meters'] = 'N/A'
+
     engine_seconds = stats_data.get('obdEngineSeconds')
     if isinstance(engine_seconds, (int, float)):
         gemelo_digital['engine_hours'] = round(engine_seconds / 3600, 2)
+        gemelo_digital['engine_hours_read_at'] = parse_samsara_time(stat_times.get('obdEngineSeconds'))
     else:
         gemelo_digital['engine_hours'] = 'N/A'
 
@@ -460,18 +716,343 @@ def process_vehicle_data(vehicle_details, vehicle_locations, vehicle_stats, vehi
 
     return gemelo_digital
 
+
+# --- SNAPSHOT DE LA FLOTA Y PRECARGA EN SEGUNDO PLANO ---
+def load_snapshot(path):
+    """
+    Lee el último snapshot persistido. Devuelve None si no existe o está dañado.
+    """
+    try:
+        with open(path, "r", encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(snapshot, dict) or not snapshot.get('rosters'):
+        return None
+    return snapshot
+
+
+def save_snapshot(path, snapshot):
+    """
+    Persiste el snapshot de forma atómica (archivo temporal + os.replace).
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def scoped_vehicle_id(org_name, vehicle_id):
+    """
+    ID de vehículo único entre organizaciones: '<org>:<id de Samsara>'.
+    """
+    return f"{org_name}:{vehicle_id}"
+
+
+def roster_signature(rosters):
+    """
+    Huella de los campos del roster que afectan a la resolución de modelos 3D.
+    """
+    digest = hashlib.sha256()
+    for org_name in sorted(rosters):
+        for details in rosters[org_name]:
+            digest.update(f"{org_name}\x1f{details.get('id')}\x1f{details.get('make')}\x1f{details.get('model')}\x1e".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class FleetSnapshotStore:
+    """
+    Mantiene el último snapshot de la flota (todas las orgs), compartido por todas las
+    sesiones. Al crearse carga el snapshot de disco; las actualizaciones se hacen en un
+    hilo en segundo plano para no bloquear el primer render.
+    """
+
+    def __init__(self, path, orgs):
+        self.path = path
+        self.orgs = orgs
+        self.snapshot = load_snapshot(path)
+        if self.snapshot is not None:
+            # Descartar orgs que ya no están configuradas
+            org_names = {org.name for org in orgs}
+            rosters = {name: r for name, r in self.snapshot['rosters'].items() if name in org_names}
+            gemelos = {vid: g for vid, g in self.snapshot.get('gemelos', {}).items() if g.get('org') in org_names}
+            self.snapshot = dict(self.snapshot, rosters=rosters, gemelos=gemelos) if rosters else None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # Serializa actualizaciones (manual y en segundo plano)
+        self._thread = None
+        self._model_assets = {}
+        self._model_assets_key = None
+        self._forecaster = None                 # maintenance_forecast.UsageForecaster (diferido)
+        self._service_intervals = None
+        self._service_intervals_key = None
+
+    def is_stale(self):
+        if self.snapshot is None:
+            return True
+        return time.time() - self.snapshot.get('updated_at', 0) > TELEMETRY_TTL_SECONDS
+
+    def is_refreshing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def refresh(self, force_roster=False):
+        """
+        Actualiza todas las orgs en paralelo (el tiempo total lo marca la org más lenta)
+        y persiste el snapshot combinado.
+        """
+        with self._refresh_lock:
+            return self._refresh(force_roster)
+
+    def _refresh(self, force_roster):
+        issues = []
+        _fetch_context.issues = issues
+        try:
+            previous_rosters = (self.snapshot or {}).get('rosters', {})
+            results = run_concurrently([
+                (lambda org=org: self._refresh_org(org, previous_rosters.get(org.name) or [], force_roster))
+                for org in self.orgs
+            ])
+
+            rosters = {}
+            gemelos = {}
+            for org, (vehicle_details, org_gemelos) in zip(self.orgs, results):
+                if vehicle_details:
+                    rosters[org.name] = vehicle_details
+                    gemelos.update(org_gemelos)
+            if not rosters:
+                return self.snapshot
+
+            snapshot = {
+                'updated_at': time.time(),
+                'rosters': rosters,
+                'roster_signature': roster_signature(rosters),
+                'gemelos': gemelos,
+                'issues': issues,
+            }
+            try:
+                snapshot['maintenance_forecast'] = self._update_forecast(snapshot)
+            except Exception:
+                logger.exception("Fallo al actualizar el pronóstico de mantenimiento")
+                snapshot['maintenance_forecast'] = (self.snapshot or {}).get('maintenance_forecast', [])
+            self.snapshot = snapshot
+            try:
+                save_snapshot(self.path, snapshot)
+            except OSError as e:
+                logger.warning("No se pudo guardar el snapshot de la flota en %s: %s", self.path, e)
+            return snapshot
+        finally:
+            _fetch_context.issues = None
+
+    def _refresh_org(self, org, vehicle_details, force_roster):
+        """
+        Roster (si caducó) + telemetría de una org. Devuelve (roster, gemelos con IDs con org).
+        """
+        # El roster del snapshot en disco se considera viejo: roster_loaded_at empieza en 0
+        roster_age = time.time() - org.roster_loaded_at
+        if force_roster or not vehicle_details or roster_age > ROSTER_TTL_SECONDS:
+            fresh_roster = get_all_vehicle_details_list(org)
+            if fresh_roster:
+                vehicle_details = fresh_roster
+                org.roster_loaded_at = time.time()
+        if not vehicle_details:
+            return [], {}
+
+        vehicle_ids = [str(v.get('id')) for v in vehicle_details]
+        locations, stats, maintenance = fetch_samsara_data_multiple_vehicles(org, vehicle_ids)
+
+        gemelos = {}
+        for details in vehicle_details:
+            gemelo = process_vehicle_data(details, locations, stats, maintenance)
+            gemelo['org'] = org.name
+            gemelo['samsara_id'] = gemelo['vehicle_id']
+            gemelo['vehicle_id'] = scoped_vehicle_id(org.name, gemelo['samsara_id'])
+            gemelos[gemelo['vehicle_id']] = gemelo
+        return vehicle_details, gemelos
+
+    def _update_forecast(self, snapshot):
+        """
+        Añade las lecturas de este ciclo al ajuste de tasas de uso (incremental) y
+        proyecta el próximo servicio de toda la flota. Anota en cada gemelo los días
+        hasta su servicio y devuelve la lista "Mantenimiento Próximo", ordenada.
+        """
+        import numpy as np
+        from maintenance_forecast import UsageForecaster
+
+        if self._forecaster is None:
+            self._forecaster = UsageForecaster.load(USAGE_MODEL_PATH, USAGE_HALF_LIFE_DAYS)
+
+        # Intervalos por vehículo: solo se resuelven cuando cambian el roster o SERVICE_INTERVALS
+        key = (snapshot['roster_signature'], model_map_signature(SERVICE_INTERVALS))
+        if key != self._service_intervals_key:
+            vehicle_ids, intervals = resolve_fleet_service_intervals(snapshot['rosters'], SERVICE_INTERVALS)
+            self._service_intervals = (vehicle_ids, {m: np.array(v, dtype=float) for m, v in intervals.items()})
+            self._service_intervals_key = key
+        vehicle_ids, intervals = self._service_intervals
+
+        gemelos = snapshot['gemelos']
+        nan = float('nan')
+        hours, km, hours_at, km_at = [], [], [], []
+        for vid in vehicle_ids:
+            gemelo = gemelos.get(vid) or {}
+            engine_hours = gemelo.get('engine_hours')
+            odometer = gemelo.get('gps_odometer_meters')
+            hours.append(engine_hours if isinstance(engine_hours, (int, float)) else nan)
+            km.append(odometer / 1000 if isinstance(odometer, (int, float)) else nan)
+            # Cada lectura con su propia hora; sin ella, la de la consulta
+            hours_at.append(gemelo.get('engine_hours_read_at') or snapshot['updated_at'])
+            km_at.append(gemelo.get('odometer_read_at') or snapshot['updated_at'])
+
+        forecaster = self._forecaster
+        forecaster.update(vehicle_ids, np.array(hours_at), {'engine_hours': np.array(hours)})
+        forecaster.update(vehicle_ids, np.array(km_at), {'odometer_km': np.array(km)})
+        result = forecaster.forecast(vehicle_ids, intervals)
+        try:
+            forecaster.save(USAGE_MODEL_PATH)
+        except OSError as e:
+            logger.warning("No se pudo guardar el modelo de uso en %s: %s", USAGE_MODEL_PATH, e)
+
+        days_until_due = result['days_until_due']
+        finite = np.isfinite(days_until_due).tolist()
+        for vid, days, has_forecast in zip(vehicle_ids, np.round(days_until_due, 1).tolist(), finite):
+            if vid in gemelos:
+                gemelos[vid]['service_due_days'] = days if has_forecast else 'N/A'
+
+        # Solo los vehículos que vencen dentro del horizonte, del más urgente al menos
+        due_soon = np.flatnonzero(days_until_due <= DUE_SOON_DAYS)
+        due_soon = due_soon[np.argsort(days_until_due[due_soon], kind='stable')]
+        rows = []
+        for i in due_soon.tolist():
+            vid = vehicle_ids[i]
+            gemelo = gemelos.get(vid) or {}
+            metric = result['due_metric'][i]
+            days = float(days_until_due[i])
+            rows.append({
+                'vehicle_id': vid,
+                'org': gemelo.get('org', 'N/A'),
+                'vehicle_name': gemelo.get('vehicle_name', 'N/A'),
+                'make': gemelo.get('make', 'N/A'),
+                'model': gemelo.get('model', 'N/A'),
+                'metric': metric,
+                'current': round(float(result[f'current_{metric}'][i]), 1),
+                'next_service_at': round(float(result[f'next_due_{metric}'][i]), 1),
+                'usage_per_day': round(float(result[f'rate_{metric}'][i]), 2),
+                'days_until_due': round(days, 1),
+                'due_date': datetime.fromtimestamp(snapshot['updated_at'] + days * 86400).strftime("%Y-%m-%d"),
+            })
+        return rows
+
+    def get_model_assets(self, snapshot, model_map):
+        """
+        {vehicle_id con org: archivo .glb} para todo el roster. Solo se recalcula
+        cuando cambian el roster o MODEL_MAP.
+        """
+        signature = snapshot.get('roster_signature') or roster_signature(snapshot['rosters'])
+        key = (signature, model_map_signature(model_map))
+        with self._lock:
+            if key != self._model_assets_key:
+                self._model_assets = resolve_fleet_models(snapshot['rosters'], model_map)
+                self._model_assets_key = key
+            return self._model_assets
+
+    def refresh_in_background(self):
+        """
+        Lanza una actualización en segundo plano si el snapshot caducó y no hay otra en curso.
+        """
+        with self._lock:
+            if self.is_refreshing() or not self.is_stale():
+                return False
+            self._thread = threading.Thread(target=self._background_refresh, name="fleet-warmup", daemon=True)
+            self._thread.start()
+            return True
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Fallo en la actualización en segundo plano de la flota")
+
+
+@st.cache_resource(show_spinner=False)
+def get_fleet_store(org_tokens):
+    """
+    Un único FleetSnapshotStore por proceso y conjunto de tokens (compartido entre sesiones).
+    """
+    orgs = [SamsaraOrg(name, token) for name, token in org_tokens]
+    return FleetSnapshotStore(SNAPSHOT_PATH, orgs)
+
+
+@st.cache_resource(show_spinner=False)
+def load_model_data_url(model_path, mtime):
+    """
+    Lee y codifica el .glb una sola vez por archivo (mtime invalida la caché).
+    """
+    with open(model_path, "rb") as f:
+        model_bytes = f.read()
+    model_b64 = base64.b64encode(model_bytes).decode("utf-8")
+    return f"data:model/gltf-binary;base64,{model_b64}"
+
+
+# --- MODELOS 3D: VARIANTES LOD (generadas con tools/build_model_lods.py) ---
+# Las variantes se sirven como archivos estáticos (server.enableStaticServing) desde
+# static/; si no hay manifiesto se vuelve al .glb completo embebido en base64.
+MODEL_MANIFEST_PATH = os.path.join("static", "modelos_3d", "manifest.json")
+# Versión fija (la misma que descarga tools/build_model_lods.py --vendor)
+MODEL_VIEWER_CDN_URL = "https://unpkg.com/@google/model-viewer@4.0.0/dist/model-viewer.min.js"
+
+
+@st.cache_resource(show_spinner=False)
+def load_model_manifest(mtime):
+    """
+    Lee el manifiesto de variantes LOD (mtime invalida la caché).
+    """
+    try:
+        with open(MODEL_MANIFEST_PATH, "r", encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning("No se pudo leer el manifiesto de modelos 3D %s: %s", MODEL_MANIFEST_PATH, e)
+        return {}
+
+
+def get_model_manifest():
+    """
+    Manifiesto de variantes LOD, o {} si no existe o no se sirven archivos estáticos.
+    """
+    if not st.get_option("server.enableStaticServing"):
+        return {}
+    try:
+        mtime = os.path.getmtime(MODEL_MANIFEST_PATH)
+    except OSError:
+        return {}
+    return load_model_manifest(mtime)
+
+
+def static_url(relative_path):
+    """
+    URL de un archivo dentro de static/ (respetando server.baseUrlPath).
+    """
+    base_path = (st.get_option("server.baseUrlPath") or "").strip("/")
+    prefix = f"/{base_path}" if base_path else ""
+    return f"{prefix}/app/static/{relative_path}"
+
+
 # --- ¡VUELVE! Función para mostrar el visor 3D ---
 def display_gltf_viewer(model_path, height=500):
     """
     Muestra un modelo 3D (GLB/GLTF) en el dashboard.
+    Con variantes LOD carga primero la más pequeña y después salta a la mejor para la pantalla.
     """
-    if not os.path.exists(model_path):
+    manifest = get_model_manifest()
+    lod_models = manifest.get('models', {})
+
+    if model_path not in lod_models and not os.path.exists(os.path.join(MODEL_ASSETS_ROOT, model_path)):
         st.error(f"Error: El archivo del modelo 3D '{model_path}' no se encontró.")
-        st.warning(f"Asegúrate de tener un archivo .glb en la ruta: {os.path.abspath(model_path)}")
+        st.warning(f"Asegúrate de tener un archivo .glb en la ruta: {os.path.abspath(os.path.join(MODEL_ASSETS_ROOT, model_path))}")
         st.warning(f"Tip: Asegúrate de que tu diccionario 'MODEL_MAP' (línea 78) apunte a archivos .glb reales en tu carpeta 'modelos_3d'.")
         # Mostrar el modelo por defecto si el específico falla
         default_path = MODEL_MAP.get("default", "truck5.glb")
-        if os.path.exists(default_path):
+        if default_path in lod_models or os.path.exists(os.path.join(MODEL_ASSETS_ROOT, default_path)):
             st.warning("Mostrando modelo 3D por defecto.")
             model_path = default_path
         else:
@@ -479,13 +1060,51 @@ def display_gltf_viewer(model_path, height=500):
             return
 
     try:
-        with open(model_path, "rb") as f:
-            model_bytes = f.read()
-        model_b64 = base64.b64encode(model_bytes).decode("utf-8")
-        data_url = f"data:model/gltf-binary;base64,{model_b64}"
+        vendor = manifest.get('vendor', {})
+        viewer_script_url = static_url(vendor['model_viewer']) if 'model_viewer' in vendor else MODEL_VIEWER_CDN_URL
+
+        lod_entry = lod_models.get(model_path)
+        progressive_script = ""
+        if lod_entry and lod_entry.get('variants'):
+            # Variantes en orden de nivel (bajo, medio, alto)
+            variants = [
+                {'url': static_url(v['path']), 'min_pixel_ratio': v.get('min_pixel_ratio', 0)}
+                for v in lod_entry['variants']
+            ]
+            model_src = variants[0]['url']
+            progressive_script = f"""
+        <script type="module">
+          // Mejora progresiva: al cargar la primera variante se descarga solo la mejor
+          // para el devicePixelRatio de la pantalla (sin pasar por las intermedias) y se
+          // cambia el src. Si falla (HTTP o al cargarla) se vuelve a la primera.
+          const viewer = document.querySelector('model-viewer');
+          const pixelRatio = window.devicePixelRatio || 1;
+          const variants = {json.dumps(variants)};
+          const first = viewer.getAttribute('src');
+          const best = variants.filter(v => pixelRatio >= v.min_pixel_ratio).pop();
+          let upgraded = false;
+          viewer.addEventListener('load', async () => {{
+            if (upgraded || !best || best.url === first) return;
+            upgraded = true;
+            try {{
+              const res = await fetch(best.url);
+              if (!res.ok) throw new Error(`HTTP ${{res.status}}`);
+              await res.arrayBuffer();  // Descarga completa (queda en la caché del navegador)
+              viewer.src = best.url;
+            }} catch (e) {{
+              console.warn('Variante LOD no disponible:', best.url, e);
+            }}
+          }});
+          viewer.addEventListener('error', () => {{
+            if (viewer.src !== first) viewer.src = first;
+          }});
+        </script>"""
+        else:
+            model_file = os.path.join(MODEL_ASSETS_ROOT, model_path)
+            model_src = load_model_data_url(model_file, os.path.getmtime(model_file))
 
         html_code = f"""
-        <script type="module" src="https://unpkg.com/@google/model-viewer/dist/model-viewer.min.js"></script>
+        <script type="module" src="{viewer_script_url}"></script>
         <style>
           model-viewer {{
             width: 100%;
@@ -498,7 +1117,7 @@ def display_gltf_viewer(model_path, height=500):
           }}
         </style>
         <model-viewer
-          src="{data_url}"
+          src="{model_src}"
           alt="Modelo 3D de Camión"
           auto-rotate
           camera-controls
@@ -515,13 +1134,57 @@ def display_gltf_viewer(model_path, height=500):
           auto-rotate-delay="1000"
           interaction-prompt="none"
           camera-target="0.0m 0.5m 0.0m"
-        ></model-viewer>
+        ></model-viewer>{progressive_script}
         """
         html(html_code, height=height, width=None, scrolling=False)
     except Exception as e:
         st.error(f"Error inesperado al cargar el modelo 3D: {e}")
 
 
+# --- RESUMEN DE LA FLOTA (pandas diferido) ---
+def build_fleet_dataframe(gemelos):
+    """
+    Construye el DataFrame de resumen. pandas se importa aquí (diferido) porque es
+    la importación más pesada del dashboard. Ojo: st.dataframe lo necesita de todos
+    modos (pyarrow importa pandas al construir la tabla); en un proceso nuevo esa
+    importación la paga el rerun que rellena las tablas (ver "Primer render sin tablas").
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(list(gemelos.values()))
+    if not df.empty:
+        # Las horas de lectura (segundos epoch) son para el pronóstico, no para la tabla
+        df = df.drop(columns=['engine_hours_read_at', 'odometer_read_at'], errors='ignore')
+        # --- ¡ARREGLO PARA EL CRASH DE ARROW! ---
+        # Convertir columnas con 'N/A' a numérico, 'coerce' convierte 'N/A' en NaN (Not-a-Number)
+        df['engine_coolant_temperature_c'] = pd.to_numeric(df['engine_coolant_temperature_c'], errors='coerce')
+        df['speed_mph'] = pd.to_numeric(df['speed_mph'], errors='coerce')
+    return df
+
+
+SERVICE_METRIC_LABELS = {'engine_hours': "Horas de motor", 'odometer_km': "Odómetro (km)"}
+
+
+def build_maintenance_dataframe(forecast_rows, org_names):
+    """
+    DataFrame de "Mantenimiento Próximo" (ya viene ordenado por urgencia).
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(forecast_rows)
+    if df.empty:
+        return df
+    df['metric'] = df['metric'].map(SERVICE_METRIC_LABELS).fillna(df['metric'])
+    columns = {
+        'vehicle_name': "Vehículo", 'make': "Marca", 'model': "Modelo", 'metric': "Servicio por",
+        'current': "Lectura actual", 'next_service_at': "Próximo servicio a", 'usage_per_day': "Uso por día",
+        'days_until_due': "Días restantes", 'due_date': "Fecha estimada",
+    }
+    if len(org_names) > 1:
+        columns = {'org': "Org", **columns}
+    return df[list(columns)].rename(columns=columns)
+
+
 # --- APLICACIÓN STREAMLIT ---
 st.title("🚚 Gemelos Digitales de Flota (Samsara)")
 
@@ -532,13 +1195,19 @@ st_autorefresh(interval=60 * 1000, key="datarefresh") # 60 segundos
 with st.sidebar:
     st.image("https://assets-global.website-files.com/60ae107d3b5c65b3f14b679c/60b001f4e5c83e1c8b360f03_logo-grey.svg", width=200)
     st.title("Controles de Flota")
+
+    # Filtro de organizaciones (solo si hay más de una configurada)
+    org_names = [name for name, _ in SAMSARA_ORG_TOKENS]
+    if len(org_names) > 1:
+        selected_orgs = st.multiselect("Organizaciones:", org_names, default=org_names, key='selected_orgs')
+    else:
+        selected_orgs = org_names
     
     # Placeholder para el selector de vehículo. Se llenará después de cargar los datos.
     vehicle_selector_placeholder = st.empty()
 
     if st.button("Actualizar Datos Manualmente"):
-        st.cache_data.clear() # Limpiar toda la caché
-        st.session_state.initial_load_complete = False # Forzar spinners en la próxima recarga
+        st.session_state.force_refresh = True # Recargar roster y telemetría en primer plano
         st.rerun() # Reiniciar la app para forzar la recarga
 
     st.markdown("---")
@@ -550,61 +1219,67 @@ if 'all_gemelos_digitales' not in st.session_state:
     st.session_state.all_gemelos_digitales = {}
 if 'all_vehicle_details' not in st.session_state:
     st.session_state.all_vehicle_details = []
-if 'initial_load_complete' not in st.session_state:
-    st.session_state.initial_load_complete = False # Flag para actualización silenciosa
-
+if 'force_refresh' not in st.session_state:
+    st.session_state.force_refresh = False
 
-# --- LÓGICA DE CARGA DE DATOS (OPTIMIZADA) ---
 
-# 1. Obtener la lista de detalles de vehículos (se cachea por 1 hora)
-vehicle_details_list = get_all_vehicle_details_list()
+# --- LÓGICA DE CARGA DE DATOS (SNAPSHOT + PRECARGA EN SEGUNDO PLANO) ---
+fleet_store = get_fleet_store(SAMSARA_ORG_TOKENS)
+snapshot = fleet_store.snapshot
 
-if vehicle_details_list:
-    st.session_state.all_vehicle_details = vehicle_details_list
-    vehicle_ids = [str(v.get('id')) for v in vehicle_details_list] # Lista de IDs
-    
-    # 2. Obtener datos dinámicos (se cachea por 55 seg)
-    # ¡NUEVO! Solo mostrar spinner si no es una actualización silenciosa
-    if not st.session_state.initial_load_complete:
-        with st.spinner(f"Cargando datos dinámicos para {len(vehicle_ids)} vehículos..."):
-            locations, stats, maintenance = fetch_samsara_data_multiple_vehicles(vehicle_ids)
-    else:
-        # Carga silenciosa (sin spinner)
-        locations, stats, maintenance = fetch_samsara_data_multiple_vehicles(vehicle_ids)
-
-    
-    # 3. Procesar y construir los gemelos
-    temp_gemelos_map = {}
-    for details in st.session_state.all_vehicle_details:
-        gemelo = process_vehicle_data(details, locations, stats, maintenance)
-        temp_gemelos_map[gemelo['vehicle_id']] = gemelo
-    
-    st.session_state.all_gemelos_digitales = temp_gemelos_map
-    
-    # ¡NUEVO! Marcar la carga inicial como completada
-    st.session_state.initial_load_complete = True
-    
+if snapshot is None or st.session_state.force_refresh:
+    # Primer arranque sin snapshot en disco (o actualización manual): carga en primer plano
+    with st.spinner("Obteniendo lista de vehículos y datos dinámicos de la flota..."):
+        snapshot = fleet_store.refresh(force_roster=st.session_state.force_refresh)
+    st.session_state.force_refresh = False
 else:
+    # Pintar con el último snapshot y refrescar en segundo plano si caducó
+    fleet_store.refresh_in_background()
+
+if not snapshot or not snapshot.get('rosters'):
     st.error("No se pudieron cargar los vehículos de la flota. Revisa el token de API y los permisos.")
     st.stop()
 
+st.session_state.all_vehicle_details = [v for roster in snapshot['rosters'].values() for v in roster]
+# Solo los gemelos de las organizaciones seleccionadas en el filtro
+st.session_state.all_gemelos_digitales = {
+    vid: g for vid, g in snapshot.get('gemelos', {}).items() if g.get('org') in selected_orgs
+}
+
+snapshot_time = datetime.fromtimestamp(snapshot.get('updated_at', 0)).strftime('%H:%M:%S')
+if fleet_store.is_refreshing():
+    st.caption(f"Datos de las `{snapshot_time}`. Actualizando en segundo plano...")
+else:
+    st.caption(f"Datos de las `{snapshot_time}`.")
+
+for issue in snapshot.get('issues', []):
+    getattr(st, issue.get('level', 'warning'))(issue.get('message', ''))
+
 
 # --- PÁGINA PRINCIPAL ---
 
-# --- Mostrar Resumen de la Flota ---
-df_fleet = pd.DataFrame(list(st.session_state.all_gemelos_digitales.values()))
+# --- Primer render sin tablas ---
+# st.dataframe necesita pandas y pyarrow (~0.4 s de importación en un proceso nuevo).
+# Mientras no estén cargados, la primera pasada de la sesión pinta la página sin las
+# tablas y un rerun inmediato (al final del script) las rellena: la página es
+# interactiva antes.
+forecast_rows = [row for row in snapshot.get('maintenance_forecast', []) if row.get('org') in selected_orgs]
+defer_tables = ('pandas' not in sys.modules and not st.session_state.get('tables_deferred')
+                and bool(st.session_state.all_gemelos_digitales or forecast_rows))
+TABLE_PENDING_TEXT = "Cargando tabla..."
 
+# --- Mostrar Resumen de la Flota ---
 st.subheader("Resumen de la Flota")
-if not df_fleet.empty:
-    # --- ¡ARREGLO PARA EL CRASH DE ARROW! ---
-    # Convertir columnas con 'N/A' a numérico, 'coerce' convierte 'N/A' en NaN (Not-a-Number)
-    df_fleet['engine_coolant_temperature_c'] = pd.to_numeric(df_fleet['engine_coolant_temperature_c'], errors='coerce')
-    df_fleet['speed_mph'] = pd.to_numeric(df_fleet['speed_mph'], errors='coerce')
-    
+df_fleet = None if defer_tables else build_fleet_dataframe(st.session_state.all_gemelos_digitales)
+if defer_tables and st.session_state.all_gemelos_digitales:
+    st.caption(TABLE_PENDING_TEXT)
+elif df_fleet is not None and not df_fleet.empty:
     # Columnas a mostrar en el resumen
     summary_cols = ['vehicle_name', 'make', 'model', 'status_alert',
                     'engine_coolant_temperature_c',
                     'speed_mph', 'current_address', 'last_data_sync']
+    if len(org_names) > 1:
+        summary_cols.insert(0, 'org')
 
     # Asegurarse de que solo mostramos columnas que existen
     display_cols = [col for col in summary_cols if col in df_fleet.columns]
@@ -613,20 +1288,39 @@ if not df_fleet.empty:
 else:
     st.warning("No hay datos de vehículos disponibles para mostrar en el resumen de la flota.")
 
+# --- Mantenimiento Próximo (pronóstico por horas de motor y odómetro) ---
+st.subheader("Mantenimiento Próximo")
+if forecast_rows and defer_tables:
+    st.caption(TABLE_PENDING_TEXT)
+elif forecast_rows:
+    st.dataframe(build_maintenance_dataframe(forecast_rows, org_names), width='stretch', hide_index=True)
+else:
+    st.info(f"Ningún vehículo alcanza su intervalo de servicio en los próximos {DUE_SOON_DAYS} días "
+            "(las tasas de uso se estiman tras al menos un día de lecturas).")
+
 st.markdown("---")
 
 # --- Llenar el selector de vehículo en la barra lateral ---
-if not df_fleet.empty:
-    vehicle_names = df_fleet['vehicle_name'].tolist()
-    # Ordenar alfabéticamente
-    vehicle_names.sort()
-    selected_vehicle_name = vehicle_selector_placeholder.selectbox(
+# Las opciones son IDs con org (los nombres pueden repetirse entre organizaciones)
+gemelos_visibles = st.session_state.all_gemelos_digitales
+if gemelos_visibles:
+    # Ordenar alfabéticamente por nombre
+    vehicle_options = sorted(gemelos_visibles, key=lambda vid: (str(gemelos_visibles[vid].get('vehicle_name')), vid))
+
+    def vehicle_label(vehicle_id):
+        gemelo = gemelos_visibles[vehicle_id]
+        if len(org_names) > 1:
+            return f"{gemelo.get('vehicle_name')} ({gemelo.get('org')})"
+        return str(gemelo.get('vehicle_name'))
+
+    selected_vehicle_id = vehicle_selector_placeholder.selectbox(
         "Selecciona un vehículo para ver detalles:", 
-        vehicle_names, 
+        vehicle_options, 
+        format_func=vehicle_label,
         key='selected_vehicle_detail'
     )
 else:
-    selected_vehicle_name = vehicle_selector_placeholder.selectbox(
+    selected_vehicle_id = vehicle_selector_placeholder.selectbox(
         "Selecciona un vehículo para ver detalles:", 
         ["No hay vehículos cargados"], 
         key='selected_vehicle_detail'
@@ -634,9 +1328,10 @@ else:
 
 # --- Mostrar Detalle del Vehículo Seleccionado ---
 st.subheader("Detalle del Gemelo Digital")
-if selected_vehicle_name and selected_vehicle_name != "No hay vehículos cargados":
+if selected_vehicle_id and selected_vehicle_id in gemelos_visibles:
     
-    selected_vehicle_data = df_fleet[df_fleet['vehicle_name'] == selected_vehicle_name].to_dict('records')[0]
+    selected_vehicle_data = gemelos_visibles[selected_vehicle_id]
+    selected_vehicle_name = selected_vehicle_data.get('vehicle_name', 'N/A')
     
     if selected_vehicle_data:
         # Definir 2 columnas: Detalles y Modelo 3D
@@ -718,32 +1413,24 @@ if selected_vehicle_name and selected_vehicle_name != "No hay vehículos cargado
             st.write(f"**Marca:** {selected_vehicle_data.get('make', 'N/A')}")
             st.write(f"**Modelo:** {selected_vehicle_data.get('model', 'N/A')}")
             st.write(f"**Año:** {selected_vehicle_data.get('year', 'N/A')}")
+            service_days = selected_vehicle_data.get('service_due_days', 'N/A')
+            service_str = f"en {service_days:.0f} días (estimado)" if isinstance(service_days, (int, float)) else "N/A"
+            st.write(f"**Próximo Servicio:** {service_str}")
             st.write(f"**Última Sincronización:** {selected_vehicle_data.get('last_data_sync', 'N/A')}")
 
 
         with col_3d_model:
             st.write(f"### Modelo 3D")
             
-            # --- ¡NUEVO! Lógica de Modelo Dinámico ---
-            vehicle_model_name = selected_vehicle_data.get('model', 'N/A')
-            
-            # 1. Buscar el archivo .glb correspondiente
-            model_path_to_display = MODEL_MAP.get(vehicle_model_name)
+            # --- Lógica de Modelo Dinámico ---
+            # 1-3. El archivo .glb de cada vehículo se resuelve en bloque al cargar el roster
+            #      (exacto, luego la clave más larga contenida en el modelo, luego el default)
+            model_assets = fleet_store.get_model_assets(snapshot, MODEL_MAP)
+            model_path_to_display = model_assets.get(selected_vehicle_id) or MODEL_MAP.get("default", "truck5.glb")
             
-            # 2. Si no se encuentra, buscar por palabra clave
-            if not model_path_to_display:
-                for key, path in MODEL_MAP.items():
-                    # Comprobar si la "clave" (ej. "Cascadia") está DENTRO del nombre del modelo (ej. "Cascadia 126")
-                    if key.lower() in vehicle_model_name.lower():
-                        model_path_to_display = path
-                        break # Usar la primera coincidencia
-            
-            # 3. Si sigue sin encontrarse, usar el default
-            if not model_path_to_display:
-                model_path_to_display = MODEL_MAP.get("default", "truck5.glb")
-            
-            # 4. Mostrar el modelo 3D
-            display_gltf_viewer(model_path_to_display, height=500)
+            # 4. Reservar el hueco: el visor 3D se carga al final (ver más abajo)
+            #    para que los datos y los DTCs se pinten primero.
+            model_viewer_placeholder = st.empty()
 
 
         # --- Sección de DTCs y Luces (debajo de las 2 columnas) ---
@@ -753,6 +1440,7 @@ if selected_vehicle_name and selected_vehicle_name != "No hay vehículos cargado
         dtcs = selected_vehicle_data.get('diagnostic_trouble_codes')
         if dtcs and isinstance(dtcs, list) and len(dtcs) > 0:
             st.warning(f"🚨 **DTCs Activos:**")
+            DTC_DEFINITIONS = load_dtc_definitions()
             
             num_columns_dtcs = 4
             cols_dtc = st.columns(num_columns_dtcs)
@@ -805,7 +1493,16 @@ if selected_vehicle_name and selected_vehicle_name != "No hay vehículos cargado
         else:
             st.info("- 🟢 Ninguna luz de Check Engine activa.")
 
+        # --- Visor 3D diferido: lo último que se carga ---
+        with model_viewer_placeholder.container():
+            display_gltf_viewer(model_path_to_display, height=500)
+
     else:
         st.warning("No se pudieron encontrar datos para el vehículo seleccionado.")
 else:
-    st.warning("No hay datos de vehículos disponibles para mostrar el detalle del camión.")
\ No newline at end of file
+    st.warning("No hay datos de vehículos disponibles para mostrar el detalle del camión.")
+
+# Rellenar las tablas que se dejaron pendientes en el primer render
+if defer_tables:
+    st.session_state.tables_deferred = True
+    st.rerun()
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+Benchmark de decodificación de páginas de la API (CPU y memoria pico).
+
+Sirve una página grande de /v1/fleet/maintenance/list (comprimida con gzip) desde
+un servidor HTTP local y compara:
+  - baseline: response.json() de la página completa y filtrado posterior
+  - orjson: orjson.loads de la página completa + proyección (lo que hacía
+    decode_page antes de limitar orjson a cuerpos pequeños)
+  - completa: samsara_json.decode_page (camino por defecto: página completa +
+    proyección de campos; orjson o json según el tamaño del cuerpo)
+  - streaming: samsara_json.decode_page con stream=True (ijson; solo se construyen
+    los vehículos objetivo). Es opcional: la app no lo usa y solo se mide si ijson
+    está instalado (no está en requirements.txt)
+
+--target-ratio es la fracción de la página que se conserva. La app pide el
+mantenimiento de todo el roster de la org, así que el caso real es 1.0; valores
+pequeños corresponden a pedir unos pocos vehículos.
+
+La memoria se mide de dos formas: el pico de tracemalloc (cuenta la memoria
+reservada, aunque no se llegue a tocar, como el documento intermedio de orjson) y
+el pico real de RSS de una decodificación en un proceso nuevo.
+
+Uso:
+    python benchmarks/bench_decode.py [--vehicles 2000] [--target-ratio 1.0]
+    python benchmarks/bench_decode.py --page pagina_grabada.json
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import samsara_json  # noqa: E402
+
+MAINTENANCE_FIELDS = ('id', 'j1939.checkEngineLight', 'j1939.diagnosticTroubleCodes')
+
+
+def build_page(num_vehicles):
+    """
+    Página sintética con la forma de /v1/fleet/maintenance/list y bloques j1939 grandes.
+    """
+    vehicles = []
+    for i in range(num_vehicles):
+        vehicles.append({
+            'id': 281474976710000 + i,
+            'j1939': {
+                'checkEngineLight': {'warningIsOn': i % 7 == 0, 'emissionsIsOn': False, 'protectIsOn': False, 'stopIsOn': False},
+                'diagnosticTroubleCodes': [
+                    {'spnId': 100 + j, 'fmiId': j % 32, 'occurrenceCount': j, 'txId': 0,
+                     'milStatus': 0, 'amberLightStatus': 1, 'redLampStatus': 0, 'protectLampStatus': 0}
+                    for j in range(i % 5)
+                ],
+                'fmiHistory': [{'spn': s, 'fmi': s % 31, 'timeMs': 1700000000000 + s} for s in range(60)],
+            },
+            'passenger': None,
+        })
+    return {'vehicles': vehicles, 'pagination': {'endCursor': '', 'hasNextPage': False}}
+
+
+def serve(body_gzip):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body_gzip)))
+            self.end_headers()
+            self.wfile.write(body_gzip)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def decode_baseline(session, url, target_ids):
+    response = session.get(url, timeout=30)
+    data = response.json()
+    items = data.get('vehicleMaintenance', []) or data.get('vehicles', [])
+    return [item for item in items if str(item.get('id')) in target_ids]
+
+
+def decode_orjson(session, url, target_ids):
+    response = session.get(url, timeout=30)
+    data = samsara_json.orjson.loads(response.content)
+    items = data.get('vehicleMaintenance', []) or data.get('vehicles', [])
+    return [samsara_json.project_fields(item, MAINTENANCE_FIELDS) for item in items
+            if str(item.get('id')) in target_ids]
+
+
+def make_decoder(stream):
+    def decode(session, url, target_ids):
+        response = session.get(url, timeout=30, stream=True)
+        items, _ = samsara_json.decode_page(
+            response, ('vehicleMaintenance', 'vehicles'), MAINTENANCE_FIELDS,
+            keep_item=lambda item_id: str(item_id) in target_ids, stream=stream
+        )
+        return items
+    return decode
+
+
+def measure(decode, session, url, target_ids, repeats):
+    cpu_times = []
+    for _ in range(repeats):
+        t0 = time.process_time()
+        decode(session, url, target_ids)
+        cpu_times.append(time.process_time() - t0)
+
+    tracemalloc.start()
+    result = decode(session, url, target_ids)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(cpu_times), peak, len(result)
+
+
+def variants():
+    found = {'baseline': ("baseline (response.json)", decode_baseline)}
+    if samsara_json.orjson is not None:
+        found['orjson'] = ("orjson (página completa)", decode_orjson)
+    found['completa'] = ("completa (decode_page)", make_decoder(False))
+    if samsara_json.ijson is not None:
+        found['streaming'] = ("streaming (opcional, ijson)", make_decoder(True))
+    return found
+
+
+def child_peak_rss(key, url, targets_path):
+    """
+    Pico de RSS (MB) por encima del de partida de UNA decodificación, en un proceso nuevo.
+    """
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", key, "--url", url, "--targets", targets_path],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def read_proc_status_kb(field):
+    """
+    Campo en KB de /proc/self/status (Linux). VmHWM es el pico de RSS del proceso;
+    a diferencia de ru_maxrss, no arrastra el del padre a través de fork/exec.
+    """
+    with open("/proc/self/status", "r", encoding='utf-8') as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} no disponible en /proc/self/status")
+
+
+def run_child(key, url, targets_path):
+    with open(targets_path, "r", encoding='utf-8') as f:
+        target_ids = set(json.load(f))
+    decode = variants()[key][1]
+    session = requests.Session()
+    rss_before = read_proc_status_kb("VmRSS")
+    decode(session, url, target_ids)
+    print(max(0, read_proc_status_kb("VmHWM") - rss_before) * 1024 / 1e6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vehicles", type=int, default=2000)
+    parser.add_argument("--target-ratio", type=float, default=1.0,
+                        help="Fracción de vehículos que se conservan (la app usa 1.0: todo el roster)")
+    parser.add_argument("--page", help="Página grabada (JSON) en lugar de la sintética")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--targets", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return run_child(args.child, args.url, args.targets)
+
+    if args.page:
+        with open(args.page, "r", encoding='utf-8') as f:
+            page = json.load(f)
+    else:
+        page = build_page(args.vehicles)
+    items = page.get('vehicleMaintenance') or page.get('vehicles') or []
+    step = max(1, round(1 / args.target_ratio)) if args.target_ratio > 0 else len(items) + 1
+    target_ids = {str(item.get('id')) for item in items[::step]}
+
+    raw_body = json.dumps(page).encode('utf-8')
+    body_gzip = gzip.compress(raw_body)
+    server = serve(body_gzip)
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/fleet/maintenance/list"
+    session = requests.Session()
+
+    print(f"Página: {len(items)} vehículos, {len(raw_body) / 1e6:.1f} MB JSON, {len(body_gzip) / 1e6:.2f} MB gzip, "
+          f"{len(target_ids)} vehículos objetivo")
+    print(f"Backends: orjson={'sí' if samsara_json.orjson else 'no'}, ijson={samsara_json.ijson.backend if samsara_json.ijson else 'no'}")
+    print(f"orjson solo hasta {samsara_json.ORJSON_MAX_BYTES / 1e6:.1f} MB: decode_page usa "
+          f"{'orjson' if samsara_json.orjson and len(raw_body) <= samsara_json.ORJSON_MAX_BYTES else 'json'} en esta página")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        targets_path = os.path.join(tmp_dir, "targets.json")
+        with open(targets_path, "w", encoding='utf-8') as f:
+            json.dump(sorted(target_ids), f)
+        for key, (name, decode) in variants().items():
+            cpu, peak, count = measure(decode, session, url, target_ids, args.repeats)
+            rss = child_peak_rss(key, url, targets_path)
+            print(f"{name:32s} CPU {cpu * 1000:8.1f} ms   pico tracemalloc {peak / 1e6:7.2f} MB   "
+                  f"pico RSS {rss:7.2f} MB   items {count}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
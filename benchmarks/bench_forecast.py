@@ -0,0 +1,121 @@
+"""
+Benchmark del pronóstico de mantenimiento (maintenance_forecast.UsageForecaster).
+
+Simula N vehículos con tasas de uso conocidas y varios días de ciclos de datos,
+y mide por ciclo lo que hace FleetSnapshotStore: armar los arreglos desde los
+gemelos, update() incremental, forecast() y la lista ordenada "due soon".
+Comprueba además que las tasas estimadas se acercan a las reales.
+
+Como en Samsara, cada lectura llega con su propia hora, hasta --max-lag-hours
+antes de la consulta (vehículos que reportan con retraso). Para comparar, también
+se informa el error si se usara la hora de la consulta para todas.
+
+Uso:
+    python benchmarks/bench_forecast.py [--vehicles 20000] [--days 3] [--cycles-per-day 24]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from maintenance_forecast import UsageForecaster  # noqa: E402
+
+DUE_SOON_DAYS = 30
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vehicles", type=int, default=20000)
+    parser.add_argument("--days", type=float, default=3)
+    parser.add_argument("--cycles-per-day", type=int, default=24)
+    parser.add_argument("--max-lag-hours", type=float, default=6)
+    parser.add_argument("--target-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    n = args.vehicles
+    vehicle_ids = [f"org:{281474976710000 + i}" for i in range(n)]
+    hours_rate = rng.uniform(2, 18, n)         # horas/día
+    km_rate = rng.uniform(100, 900, n)         # km/día
+    hours0 = rng.uniform(1000, 40000, n)
+    km0 = rng.uniform(10000, 900000, n)
+    intervals = {'engine_hours': np.full(n, 500.0), 'odometer_km': np.full(n, 40000.0)}
+    missing = rng.random(n) < 0.05             # Vehículos sin telemetría en cada ciclo
+
+    forecaster = UsageForecaster()
+    fetch_time_forecaster = UsageForecaster()  # Solo para comparar el error (no se mide)
+    start = 1_760_000_000.0
+    cycle_times = []
+    total_cycles = int(args.days * args.cycles_per_day)
+    for cycle in range(total_cycles + 1):
+        t_days = cycle / args.cycles_per_day
+        fetched_at = start + t_days * 86400
+        read_days = np.maximum(t_days - rng.uniform(0, args.max_lag_hours / 24, n), 0.0)
+        noise = rng.normal(0, 0.05, n)
+        gemelos = {
+            vid: {'engine_hours': float(h), 'gps_odometer_meters': float(k) * 1000,
+                  'engine_hours_read_at': float(at), 'odometer_read_at': float(at)}
+            for vid, h, k, at in zip(vehicle_ids,
+                                     hours0 + hours_rate * read_days + noise,
+                                     km0 + km_rate * read_days + noise,
+                                     start + read_days * 86400)
+        }
+        for i in np.flatnonzero(missing & (rng.random(n) < 0.5)).tolist():
+            gemelos[vehicle_ids[i]]['engine_hours'] = 'N/A'
+
+        t0 = time.perf_counter()
+        hours, km, hours_at, km_at = [], [], [], []
+        for vid in vehicle_ids:
+            gemelo = gemelos[vid]
+            h, odo = gemelo['engine_hours'], gemelo['gps_odometer_meters']
+            hours.append(h if isinstance(h, (int, float)) else np.nan)
+            km.append(odo / 1000 if isinstance(odo, (int, float)) else np.nan)
+            hours_at.append(gemelo.get('engine_hours_read_at') or fetched_at)
+            km_at.append(gemelo.get('odometer_read_at') or fetched_at)
+        forecaster.update(vehicle_ids, np.array(hours_at), {'engine_hours': np.array(hours)})
+        forecaster.update(vehicle_ids, np.array(km_at), {'odometer_km': np.array(km)})
+        result = forecaster.forecast(vehicle_ids, intervals)
+        days = result['days_until_due']
+        due_soon = np.flatnonzero(days <= DUE_SOON_DAYS)
+        due_soon = due_soon[np.argsort(days[due_soon], kind='stable')]
+        cycle_times.append(time.perf_counter() - t0)
+
+        fetch_time_forecaster.update(vehicle_ids, fetched_at,
+                                     {'engine_hours': np.array(hours), 'odometer_km': np.array(km)})
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "uso.npz")
+        t0 = time.perf_counter()
+        forecaster.save(path)
+        save_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        UsageForecaster.load(path)
+        load_ms = (time.perf_counter() - t0) * 1000
+
+    def rate_errors(forecast):
+        return (np.nanmedian(np.abs(forecast['rate_engine_hours'] - hours_rate) / hours_rate),
+                np.nanmedian(np.abs(forecast['rate_odometer_km'] - km_rate) / km_rate))
+
+    hours_error, km_error = rate_errors(result)
+    fetch_hours_error, fetch_km_error = rate_errors(fetch_time_forecaster.forecast(vehicle_ids, intervals))
+    p95 = sorted(cycle_times)[int(0.95 * (len(cycle_times) - 1))] * 1000
+    print(f"{n} vehículos, {total_cycles + 1} ciclos en {args.days:g} días")
+    print(f"ciclo (arreglos + update + forecast + orden): mediana {statistics.median(cycle_times) * 1000:.1f} ms, "
+          f"p95 {p95:.1f} ms, primero {cycle_times[0] * 1000:.1f} ms")
+    print(f"guardar estado {save_ms:.1f} ms, cargar {load_ms:.1f} ms")
+    print(f"error mediano de la tasa: horas {hours_error * 100:.2f}%, km {km_error * 100:.2f}%; "
+          f"vencen en {DUE_SOON_DAYS} días: {len(due_soon)}")
+    print(f"con la hora de la consulta en vez de la de cada lectura: horas {fetch_hours_error * 100:.2f}%, "
+          f"km {fetch_km_error * 100:.2f}%")
+    ok = p95 < args.target_ms
+    print(f"objetivo < {args.target_ms:.0f} ms por ciclo: {'OK' if ok else 'NO'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
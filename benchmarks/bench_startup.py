@@ -0,0 +1,147 @@
+"""
+Benchmark de arranque del dashboard.
+
+Mide, en procesos nuevos (arranque en frío del intérprete):
+  1. El tiempo de importación de los módulos de nivel superior de app.py.
+  2. El tiempo hasta que la app es interactiva (fin de la primera pasada del
+     script) partiendo de un snapshot en disco, usando streamlit.testing. Cuenta
+     desde antes de importar streamlit, como el arranque de un dyno: incluye la
+     importación de streamlit, el escaneo de componentes del runtime, la lectura
+     del snapshot y el render. En un proceso nuevo app.py pinta esa pasada sin las
+     tablas (st.dataframe necesita pandas/pyarrow) y las rellena con un rerun
+     inmediato; también se informa el tiempo hasta tener las tablas.
+  3. El tiempo hasta interactivo de una sesión nueva en el mismo proceso
+     (servidor ya arrancado, módulos ya importados).
+
+Uso:
+    python benchmarks/bench_startup.py [--vehicles 500] [--runs 5]
+
+El objetivo es < 1 s hasta interactivo (medida 2) con el snapshot en disco.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGET_SECONDS = 1.0
+
+IMPORT_SNIPPET = """
+import time
+t0 = time.perf_counter()
+import json, threading, logging, base64
+import streamlit as st
+from streamlit.components.v1 import html
+from streamlit_autorefresh import st_autorefresh
+print(time.perf_counter() - t0)
+"""
+
+FIRST_RUN_SNIPPET = """
+import time
+t0 = time.perf_counter()
+from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+# Fin de cada pasada del script (AppTest.run() espera también a los reruns internos)
+PASS_END = (ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS, ScriptRunnerEvent.SCRIPT_STOPPED_FOR_RERUN)
+pass_ends = []
+_init = LocalScriptRunner.__init__
+def init(self, *args, **kwargs):
+    _init(self, *args, **kwargs)
+    self.on_event.connect(lambda sender, event, **kw: event in PASS_END and pass_ends.append(time.perf_counter()),
+                          weak=False)
+LocalScriptRunner.__init__ = init
+
+at = AppTest.from_file("app.py", default_timeout=30)
+at.secrets["SAMSARA_API_TOKEN"] = "benchmark"
+at.run()
+t_tables = time.perf_counter() - t0
+t_first = pass_ends[0] - t0
+assert not at.exception, at.exception
+assert not any(e.value == "Cargando tabla..." for e in at.caption), "tablas sin rellenar"
+t1 = time.perf_counter()
+at.run()
+t_rerun = time.perf_counter() - t1
+t2 = time.perf_counter()
+session = AppTest.from_file("app.py", default_timeout=30)
+session.secrets["SAMSARA_API_TOKEN"] = "benchmark"
+session.run()
+assert not session.exception, session.exception
+print(t_first, t_tables, t_rerun, time.perf_counter() - t2)
+"""
+
+
+def build_snapshot(num_vehicles):
+    """
+    Snapshot sintético con la misma forma que FleetSnapshotStore persiste.
+    """
+    vehicle_details = []
+    gemelos = {}
+    for i in range(num_vehicles):
+        samsara_id = str(281474976710000 + i)
+        vehicle_id = f"principal:{samsara_id}"
+        vehicle_details.append({'id': samsara_id, 'name': f"Unidad {i:05d}", 'make': 'Freightliner', 'model': 'Cascadia 126', 'year': 2021})
+        gemelos[vehicle_id] = {
+            'vehicle_id': vehicle_id, 'samsara_id': samsara_id, 'org': 'principal', 'vehicle_name': f"Unidad {i:05d}",
+            'make': 'Freightliner', 'model': 'Cascadia 126', 'year': 2021, 'license_plate': 'N/A',
+            'latitude': 19.43 + i * 1e-4, 'longitude': -99.13, 'speed_mph': 42.0,
+            'current_address': 'Ciudad de México', 'gps_odometer_meters': 'N/A', 'location_updated_at': 'N/A',
+            'engine_hours': 1234.5, 'fuel_perc_remaining': 'N/A', 'engine_oil_pressure_kpa': 310.0,
+            'engine_coolant_temperature_c': 88.0, 'engine_rpm': 1400, 'ambient_air_temperature_c': 21.0,
+            'engine_check_light_warning': False, 'engine_check_light_emissions': False,
+            'engine_check_light_protect': False, 'engine_check_light_stop': False,
+            'diagnostic_trouble_codes': [], 'last_data_sync': '2026-01-01 00:00:00',
+            'status_alert': 'OPERANDO NORMALMENTE', 'alert_color': 'green',
+        }
+    return {'updated_at': time.time(), 'rosters': {'principal': vehicle_details}, 'gemelos': gemelos, 'issues': []}
+
+
+def run_python(snippet, env):
+    output = subprocess.run([sys.executable, "-c", snippet], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return [float(x) for x in output.strip().splitlines()[-1].split()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vehicles", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_path = os.path.join(tmp_dir, "fleet_snapshot.json")
+        with open(snapshot_path, "w", encoding='utf-8') as f:
+            json.dump(build_snapshot(args.vehicles), f)
+
+        env = dict(os.environ)
+        env["FLEET_SNAPSHOT_PATH"] = snapshot_path
+        # Puerto cerrado: la precarga en segundo plano falla rápido y no toca la API real
+        env["SAMSARA_API_ROOT"] = "http://127.0.0.1:9"
+
+        import_times, first_runs, with_tables, reruns, new_sessions = [], [], [], [], []
+        for _ in range(args.runs):
+            import_times.extend(run_python(IMPORT_SNIPPET, env))
+            first, tables, rerun, new_session = run_python(FIRST_RUN_SNIPPET, env)
+            first_runs.append(first)
+            with_tables.append(tables)
+            reruns.append(rerun)
+            new_sessions.append(new_session)
+
+    print(f"Vehículos en snapshot: {args.vehicles}, repeticiones: {args.runs}")
+    print(f"Importación de módulos (mediana): {statistics.median(import_times) * 1000:.0f} ms")
+    print(f"Hasta interactivo, proceso en frío (mediana): {statistics.median(first_runs) * 1000:.0f} ms")
+    print(f"Hasta tener las tablas, proceso en frío (mediana): {statistics.median(with_tables) * 1000:.0f} ms")
+    print(f"Sesión nueva con el servidor arrancado (mediana): {statistics.median(new_sessions) * 1000:.0f} ms")
+    print(f"Rerun con caché caliente (mediana): {statistics.median(reruns) * 1000:.0f} ms")
+    ok = statistics.median(first_runs) < TARGET_SECONDS
+    print(f"Objetivo < {TARGET_SECONDS:.1f} s: {'OK' if ok else 'NO CUMPLE'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
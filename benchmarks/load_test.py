@@ -0,0 +1,287 @@
+"""
+Prueba de carga multi-sesión del dashboard.
+
+Arranca un mock de Samsara (benchmarks/mock_samsara.py) y una instancia local de
+`streamlit run app.py` apuntando a él, y simula N sesiones de navegador por
+WebSocket (protocolo de Streamlit). Cada sesión hace un primer run y después
+reruns periódicos, como hace st_autorefresh. Para cada N informa:
+
+  - latencia por rerun (p50 / p95 / p99, desde el BackMsg hasta script_finished)
+  - CPU media y RSS máximo del servidor de Streamlit
+  - bytes de WebSocket recibidos por sesión
+  - llamadas a la API de Samsara (mock) durante el escalón, en total y por minuto
+
+El visor 3D entra en la medida: cada ruta de MODEL_MAP apunta (MODEL_ASSETS_ROOT)
+a un camión sintético (benchmarks/synthetic_truck.py) o al .glb de --model, así
+que el .glb embebido en base64 cuenta en latencia y bytes. Si hay variantes LOD
+(static/modelos_3d/manifest.json) el visor las pide por HTTP y esos bytes no pasan
+por el WebSocket.
+
+Cada escalón dura por defecto dos veces el TTL de la telemetría de app.py, para
+que las llamadas a la API incluyan refrescos completos.
+
+Uso:
+    python benchmarks/load_test.py --sessions 1,5,10,25 --rerun-interval 5
+    python benchmarks/load_test.py --sessions 10 --duration 300 --model modelos_3d/CASCADIA.glb
+
+Requiere: websockets y psutil (además de las dependencias de la app).
+"""
+import argparse
+import ast
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import psutil
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_samsara import start_mock_server  # noqa: E402
+from synthetic_truck import build_truck_glb  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_app_constants(names):
+    """
+    Valores literales de constantes de nivel superior de app.py (sin ejecutarlo).
+    """
+    with open(os.path.join(REPO_ROOT, "app.py"), "r", encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    values = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id in names:
+                    values[target.id] = ast.literal_eval(node.value)
+    return values
+
+
+def prepare_models(models_dir, model_paths, source):
+    """
+    Enlaza `source` en cada ruta de MODEL_MAP dentro de models_dir.
+    """
+    for model_path in set(model_paths):
+        target = os.path.join(models_dir, model_path)
+        os.makedirs(os.path.dirname(target) or models_dir, exist_ok=True)
+        os.symlink(os.path.abspath(source), target)
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class SimulatedSession:
+    """
+    Una sesión de navegador: conecta por WebSocket, pide reruns y mide cada uno.
+    Emula la caché de mensajes del navegador enviando los hashes ya recibidos.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.latencies = []
+        self.bytes_received = 0
+        self.errors = 0
+        self._cached_hashes = set()
+
+    def _rerun_msg(self, is_auto_rerun):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.is_auto_rerun = is_auto_rerun
+        msg.rerun_script.cached_message_hashes.extend(sorted(self._cached_hashes))
+        return msg.SerializeToString()
+
+    async def _wait_script_finished(self, ws):
+        while True:
+            payload = await ws.recv()
+            self.bytes_received += len(payload)
+            msg = ForwardMsg()
+            msg.ParseFromString(payload)
+            if msg.metadata.cacheable and msg.hash:
+                self._cached_hashes.add(msg.hash)
+            if msg.WhichOneof('type') == 'script_finished':
+                # El primer render de una sesión puede terminar pidiendo un rerun (tablas
+                # diferidas en app.py): el rerun llega por el mismo WebSocket
+                if msg.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                return msg.script_finished
+
+    async def run(self, stop_at, rerun_interval):
+        try:
+            async with websockets.connect(self.url, subprotocols=["streamlit"], max_size=None) as ws:
+                first = True
+                while time.monotonic() < stop_at:
+                    t0 = time.perf_counter()
+                    await ws.send(self._rerun_msg(is_auto_rerun=not first))
+                    status = await self._wait_script_finished(ws)
+                    if status == ForwardMsg.FINISHED_SUCCESSFULLY:
+                        self.latencies.append(time.perf_counter() - t0)
+                    else:
+                        self.errors += 1
+                    first = False
+                    # Jitter para que las sesiones no se sincronicen
+                    await asyncio.sleep(rerun_interval * random.uniform(0.8, 1.2))
+        except (OSError, websockets.WebSocketException):
+            self.errors += 1
+
+
+class ProcessSampler(threading.Thread):
+    """
+    Muestrea CPU y RSS del servidor (proceso y sus hijos) en segundo plano.
+    """
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.cpu_samples = []
+        self.rss_samples = []
+        self._stop_event = threading.Event()
+
+    def _processes(self):
+        return [self.process] + self.process.children(recursive=True)
+
+    def run(self):
+        for proc in self._processes():
+            proc.cpu_percent(None)
+        while not self._stop_event.wait(self.interval):
+            cpu, rss = 0.0, 0
+            for proc in self._processes():
+                try:
+                    cpu += proc.cpu_percent(None)
+                    rss += proc.memory_info().rss
+                except psutil.NoSuchProcess:
+                    continue
+            self.cpu_samples.append(cpu)
+            self.rss_samples.append(rss)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def start_streamlit(port, api_root, tmp_dir, orgs, models_dir):
+    secrets_path = os.path.join(tmp_dir, "secrets.toml")
+    with open(secrets_path, "w", encoding='utf-8') as f:
+        if orgs == 1:
+            f.write('SAMSARA_API_TOKEN = "loadtest"\n')
+        else:
+            f.write("[SAMSARA_ORGS]\n")
+            for i in range(orgs):
+                f.write(f'org{i} = "loadtest{i}"\n')
+
+    env = dict(os.environ)
+    env["SAMSARA_API_ROOT"] = api_root
+    env["FLEET_SNAPSHOT_PATH"] = os.path.join(tmp_dir, "fleet_snapshot.json")
+    env["MODEL_ASSETS_ROOT"] = models_dir
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", "app.py",
+        "--server.headless", "true",
+        "--server.port", str(port),
+        "--server.enableXsrfProtection", "false",
+        "--server.enableCORS", "false",
+        "--browser.gatherUsageStats", "false",
+        "--secrets.files", secrets_path,
+    ]
+    process = subprocess.Popen(cmd, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("El servidor de Streamlit no arrancó en 60 s")
+
+
+async def run_step(ws_url, sessions, duration, rerun_interval):
+    stop_at = time.monotonic() + duration
+    simulated = [SimulatedSession(ws_url) for _ in range(sessions)]
+    await asyncio.gather(*(s.run(stop_at, rerun_interval) for s in simulated))
+    return simulated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default="1,5,10,25", help="Escalones de sesiones concurrentes (ej. 1,5,10)")
+    parser.add_argument("--duration", type=float, help="Segundos por escalón (por defecto, 2x el TTL de la telemetría)")
+    parser.add_argument("--rerun-interval", type=float, default=5, help="Segundos entre reruns por sesión")
+    parser.add_argument("--vehicles", type=int, default=500, help="Vehículos por org en el mock")
+    parser.add_argument("--orgs", type=int, default=1, help="Número de orgs (tokens) configuradas")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latencia por petición del mock (s)")
+    parser.add_argument("--model", help=".glb para todos los modelos de MODEL_MAP (por defecto, el camión sintético)")
+    parser.add_argument("--port", type=int, default=8599)
+    args = parser.parse_args()
+    steps = [int(n) for n in args.sessions.split(",") if n.strip()]
+    app_constants = read_app_constants({"MODEL_MAP", "TELEMETRY_TTL_SECONDS"})
+    ttl = app_constants["TELEMETRY_TTL_SECONDS"]
+    duration = args.duration or 2 * ttl
+    if duration < ttl:
+        print(f"Aviso: escalones de {duration:.0f} s < TTL de la telemetría ({ttl} s); "
+              "las llamadas a la API dependen de en qué escalón caiga cada refresco.")
+
+    mock_server, fleet = start_mock_server(0, args.vehicles, args.latency)
+    api_root = f"http://127.0.0.1:{mock_server.server_address[1]}"
+    ws_url = f"ws://127.0.0.1:{args.port}/_stcore/stream"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_source = args.model
+        if not model_source:
+            model_source = os.path.join(tmp_dir, "camion_sintetico.glb")
+            build_truck_glb(model_source)
+        models_dir = os.path.join(tmp_dir, "modelos")
+        prepare_models(models_dir, app_constants["MODEL_MAP"].values(), model_source)
+
+        server = start_streamlit(args.port, api_root, tmp_dir, args.orgs, models_dir)
+        try:
+            # Calentamiento: la primera sesión hace la carga inicial en primer plano
+            asyncio.run(run_step(ws_url, 1, 0.1, 0))
+
+            print(f"Flota mock: {args.orgs} org(s) x {args.vehicles} vehículos, latencia {args.latency * 1000:.0f} ms; "
+                  f"{duration:.0f} s por escalón (TTL telemetría {ttl} s), rerun cada ~{args.rerun_interval:.0f} s")
+            print(f"Modelo 3D: {os.path.basename(model_source)}, {os.path.getsize(model_source) / 1e6:.1f} MB")
+            print(f"{'sesiones':>8} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errores':>7} "
+                  f"{'CPU %':>7} {'RSS MB':>7} {'KB/sesión':>10} {'llamadas API':>12} {'API/min':>8}")
+            for sessions in steps:
+                fleet.reset()
+                sampler = ProcessSampler(server.pid)
+                sampler.start()
+                t0 = time.monotonic()
+                simulated = asyncio.run(run_step(ws_url, sessions, duration, args.rerun_interval))
+                wall_minutes = (time.monotonic() - t0) / 60
+                sampler.stop()
+
+                latencies = [lat for s in simulated for lat in s.latencies]
+                errors = sum(s.errors for s in simulated)
+                kb_per_session = statistics.mean(s.bytes_received for s in simulated) / 1024
+                cpu = statistics.mean(sampler.cpu_samples) if sampler.cpu_samples else float('nan')
+                rss = max(sampler.rss_samples) / 1e6 if sampler.rss_samples else float('nan')
+                total_calls = fleet.stats()['total_calls']
+                print(f"{sessions:>8} {len(latencies):>7} {percentile(latencies, 50) * 1000:>8.0f} "
+                      f"{percentile(latencies, 95) * 1000:>8.0f} {percentile(latencies, 99) * 1000:>8.0f} {errors:>7} "
+                      f"{cpu:>7.0f} {rss:>7.0f} {kb_per_session:>10.0f} {total_calls:>12} "
+                      f"{total_calls / wall_minutes:>8.1f}")
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+            mock_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Servidor mock de la API de Samsara para benchmarks y pruebas de carga.
+
+Sirve los endpoints que usa app.py (/fleet/vehicles, /fleet/vehicles/locations,
+/fleet/vehicles/stats y /v1/fleet/maintenance/list) con una flota sintética por
+token, latencia configurable y contadores de llamadas (GET /__stats).
+
+Uso:
+    python benchmarks/mock_samsara.py --port 8765 --vehicles 500 --latency 0.05
+"""
+import argparse
+import gzip
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PAGE_SIZE = 512
+MODELS = [("Freightliner", "Cascadia 126"), ("Kenworth", "T680"), ("Volvo", "VNL 860"), ("International", "LT625")]
+
+
+class MockFleet:
+    """
+    Flota sintética determinista (una por token) y contadores de llamadas por endpoint.
+    """
+
+    def __init__(self, num_vehicles, latency):
+        self.num_vehicles = num_vehicles
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+
+    def count(self, path):
+        with self._lock:
+            self.calls[path] += 1
+
+    def stats(self):
+        with self._lock:
+            return {'calls': dict(self.calls), 'total_calls': sum(self.calls.values())}
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+    def vehicle_ids(self, token):
+        base = 281474976710000 + (sum(token.encode()) % 1000) * 100000
+        return [str(base + i) for i in range(self.num_vehicles)]
+
+    def vehicle(self, token, index, vehicle_id):
+        make, model = MODELS[index % len(MODELS)]
+        return {'id': vehicle_id, 'name': f"{token[:4].upper()}-{index:05d}", 'make': make, 'model': model,
+                'year': 2018 + index % 7, 'licensePlate': f"MX{index:05d}", 'vin': f"1FUJ{index:013d}"}
+
+    def elapsed(self):
+        return time.time() - self._started_at
+
+
+def paginate(items, after):
+    start = int(after) if after else 0
+    end = start + PAGE_SIZE
+    cursor = str(end) if end < len(items) else ""
+    return items[start:end], {'endCursor': cursor, 'hasNextPage': bool(cursor)}
+
+
+def make_handler(fleet):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            gzip_ok = 'gzip' in self.headers.get('Accept-Encoding', '')
+            if gzip_ok:
+                payload = gzip.compress(payload, compresslevel=1)
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            if gzip_ok:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == '/__stats':
+                return self._send(200, fleet.stats())
+            if url.path == '/__reset':
+                fleet.reset()
+                return self._send(200, {'ok': True})
+
+            token = self.headers.get('Authorization', '').replace('Bearer ', '')
+            if not token:
+                return self._send(401, {'message': 'Unauthorized'})
+            fleet.count(url.path)
+            if fleet.latency:
+                time.sleep(fleet.latency)
+
+            ids = fleet.vehicle_ids(token)
+            after = query.get('after', [None])[0]
+            if url.path == '/fleet/vehicles':
+                vehicles = [fleet.vehicle(token, i, vid) for i, vid in enumerate(ids)]
+                data, pagination = paginate(vehicles, after)
+                return self._send(200, {'data': data, 'pagination': pagination})
+            if url.path == '/fleet/vehicles/locations':
+                requested = query.get('ids', [''])[0].split(',')
+                t = fleet.elapsed()
+                data = [{'id': vid, 'name': vid, 'location': {
+                    'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                    'latitude': 19.43 + (int(vid) % 997) * 1e-3, 'longitude': -99.13 - (int(vid) % 991) * 1e-3,
+                    'heading': 90, 'speed': (int(vid) + t) % 65,
+                    'reverseGeo': {'formattedLocation': 'Ciudad de México, CDMX'},
+                    'gpsOdometerMeters': 150_000_000 + (int(vid) % 5000) * 1000 + t * 25,
+                }} for vid in requested if vid]
+                return self._send(200, {'data': data, 'pagination': {'endCursor': '', 'hasNextPage': False}})
+            if url.path == '/fleet/vehicles/stats':
+                requested = query.get('vehicleIds', [''])[0].split(',')
+                types = query.get('types', [''])[0].split(',')
+                t = fleet.elapsed()
+                read_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                values = {
+                    'engineCoolantTemperatureMilliC': lambda v: 80000 + int(v) % 15000,
+                    'ambientAirTemperatureMilliC': lambda v: 21000,
+                    'engineRpm': lambda v: 600 + int(v) % 1400,
+                    'obdEngineSeconds': lambda v: 30_000_000 + (int(v) % 4000) * 3600 + t,
+                    'engineOilPressureKPa': lambda v: 250 + int(v) % 150,
+                    'gpsOdometerMeters': lambda v: 150_000_000 + (int(v) % 5000) * 1000 + t * 25,
+                }
+                data = []
+                for vid in requested:
+                    if not vid:
+                        continue
+                    item = {'id': vid, 'name': vid}
+                    for stat_type in types:
+                        if stat_type in values:
+                            item[stat_type] = {'time': read_at, 'value': values[stat_type](vid)}
+                    data.append(item)
+                return self._send(200, {'data': data, 'pagination': {'endCursor': '', 'hasNextPage': False}})
+            if url.path == '/v1/fleet/maintenance/list':
+                items = []
+                for vid in ids:
+                    failing = int(vid) % 13 == 0
+                    items.append({'id': int(vid), 'j1939': {
+                        'checkEngineLight': {'warningIsOn': failing, 'emissionsIsOn': False, 'protectIsOn': False, 'stopIsOn': False},
+                        'diagnosticTroubleCodes': [{'spnId': 100, 'fmiId': 1, 'occurrenceCount': 3}] if failing else [],
+                    }})
+                data, pagination = paginate(items, after)
+                return self._send(200, {'vehicles': data, 'pagination': pagination})
+            return self._send(404, {'message': 'Not found'})
+
+    return Handler
+
+
+def start_mock_server(port=0, num_vehicles=500, latency=0.0):
+    """
+    Arranca el mock en un hilo. Devuelve (server, fleet); la URL raíz es
+    f"http://127.0.0.1:{server.server_address[1]}".
+    """
+    fleet = MockFleet(num_vehicles, latency)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(fleet))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-samsara", daemon=True).start()
+    return server, fleet
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--vehicles", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="Segundos de latencia por petición")
+    args = parser.parse_args()
+    server, _ = start_mock_server(args.port, args.vehicles, args.latency)
+    print(f"Mock de Samsara en http://127.0.0.1:{server.server_address[1]} ({args.vehicles} vehículos por token)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
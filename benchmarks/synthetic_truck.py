@@ -0,0 +1,265 @@
+"""
+Modelo 3D sintético de un camión (.glb) para benchmarks.
+
+El repo no incluye los .glb de MODEL_MAP. Este generador produce uno determinista
+con el perfil de un modelo de catálogo: ~230 mil triángulos (cabina, cofre, caja,
+chasis y ruedas instanciadas) con normales y UVs, y texturas PNG de 2048 px
+(color, normales y metálico/rugosidad) para la carrocería y de 1024 px para las
+llantas. Sirve como entrada de tools/build_model_lods.py y como el modelo que
+embebe el visor en benchmarks/load_test.py.
+
+Uso:
+    python benchmarks/synthetic_truck.py truck5.glb [--detail 1.0] [--texture-size 2048]
+"""
+import argparse
+import io
+import json
+import struct
+import sys
+
+import numpy as np
+from PIL import Image
+
+FLOAT, UINT32 = 5126, 5125
+ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER = 34962, 34963
+
+
+def superquadric(segments_u, segments_v, size, exponents):
+    """
+    Superficie cerrada tipo "caja redondeada" (superelipsoide) como malla en rejilla.
+    Devuelve (posiciones, uvs, índices); las UV son los parámetros de la rejilla.
+    """
+    u = np.linspace(-np.pi, np.pi, segments_u + 1)
+    v = np.linspace(-np.pi / 2, np.pi / 2, segments_v + 1)
+    uu, vv = np.meshgrid(u, v, indexing='xy')
+
+    def signed_pow(x, e):
+        return np.sign(x) * np.abs(x) ** e
+
+    e_vertical, e_horizontal = exponents
+    cos_v, sin_v = signed_pow(np.cos(vv), e_vertical), signed_pow(np.sin(vv), e_vertical)
+    x = size[0] * cos_v * signed_pow(np.cos(uu), e_horizontal)
+    y = size[1] * sin_v
+    z = size[2] * cos_v * signed_pow(np.sin(uu), e_horizontal)
+    positions = np.stack([x, y, z], axis=-1).reshape(-1, 3)
+    uvs = np.stack([(uu + np.pi) / (2 * np.pi), (vv + np.pi / 2) / np.pi], axis=-1).reshape(-1, 2)
+    return positions, uvs, grid_indices(segments_u, segments_v)
+
+
+def torus(segments_u, segments_v, radius, tube, width):
+    """
+    Llanta: toro achatado en el eje de giro (x).
+    """
+    u = np.linspace(0, 2 * np.pi, segments_u + 1)
+    v = np.linspace(0, 2 * np.pi, segments_v + 1)
+    uu, vv = np.meshgrid(u, v, indexing='xy')
+    ring = radius + tube * np.cos(vv)
+    x = width * np.sin(vv)
+    y = ring * np.cos(uu)
+    z = ring * np.sin(uu)
+    positions = np.stack([x, y, z], axis=-1).reshape(-1, 3)
+    uvs = np.stack([uu / (2 * np.pi), vv / (2 * np.pi)], axis=-1).reshape(-1, 2)
+    return positions, uvs, grid_indices(segments_u, segments_v)
+
+
+def grid_indices(segments_u, segments_v):
+    row = segments_u + 1
+    i, j = np.meshgrid(np.arange(segments_u), np.arange(segments_v), indexing='xy')
+    a = (j * row + i).ravel()
+    b, c, d = a + 1, a + row, a + row + 1
+    return np.stack([a, c, b, b, c, d], axis=-1).reshape(-1).astype(np.uint32)
+
+
+def vertex_normals(positions, indices):
+    triangles = positions[indices.reshape(-1, 3)]
+    face_normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    normals = np.zeros_like(positions)
+    for corner in range(3):
+        np.add.at(normals, indices.reshape(-1, 3)[:, corner], face_normals)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, lengths, out=np.tile([0.0, 1.0, 0.0], (len(normals), 1)), where=lengths > 1e-12)
+    return normals
+
+
+def paint_texture(size, base_color, stripe_color, rng):
+    """
+    Pintura con degradado, franjas y "grano" fino (como una textura horneada).
+    """
+    y, x = np.mgrid[0:size, 0:size] / size
+    shade = 0.85 + 0.15 * np.cos(2 * np.pi * y)[..., None]
+    image = np.asarray(base_color, dtype=float) * shade
+    stripes = (np.abs(((y * 12) % 1) - 0.5) < 0.04)[..., None]
+    image = np.where(stripes, np.asarray(stripe_color, dtype=float), image)
+    blotches = np.kron(rng.normal(0, 10, (size // 32, size // 32, 1)), np.ones((32, 32, 1)))
+    grain = rng.normal(0, 4, (size, size, 1))
+    return np.clip(image + blotches + grain, 0, 255).astype(np.uint8)
+
+
+def normal_texture(size, rng):
+    """
+    Mapa de normales a partir de un relieve con remaches, paneles y ruido.
+    """
+    y, x = np.mgrid[0:size, 0:size] / size
+    height = 0.5 * (np.sin(2 * np.pi * 48 * x) * np.sin(2 * np.pi * 48 * y) > 0.97)
+    height = height + 0.3 * ((np.abs(((x * 8) % 1) - 0.5) < 0.01) | (np.abs(((y * 6) % 1) - 0.5) < 0.01))
+    height = height + rng.normal(0, 0.02, (size, size))
+    dy, dx = np.gradient(height)
+    normal = np.stack([-dx * 4, -dy * 4, np.ones_like(height)], axis=-1)
+    normal /= np.linalg.norm(normal, axis=-1, keepdims=True)
+    return ((normal * 0.5 + 0.5) * 255).astype(np.uint8)
+
+
+def metal_roughness_texture(size, rng):
+    rough = 120 + rng.normal(0, 12, (size, size))
+    metal = np.full((size, size), 40.0)
+    return np.clip(np.stack([np.zeros_like(rough), rough, metal], axis=-1), 0, 255).astype(np.uint8)
+
+
+def png_bytes(array):
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class GlbWriter:
+    """
+    Acumula bufferViews/accessors en un único buffer binario y escribe el .glb.
+    """
+
+    def __init__(self):
+        self.gltf = {'asset': {'version': '2.0', 'generator': 'benchmarks/synthetic_truck.py'},
+                     'buffers': [{}], 'bufferViews': [], 'accessors': [], 'images': [], 'textures': [],
+                     'samplers': [{}], 'materials': [], 'meshes': [], 'nodes': [], 'scenes': [{'nodes': [0]}],
+                     'scene': 0}
+        self.chunks = []
+        self.offset = 0
+
+    def view(self, data, target=None):
+        padding = (-self.offset) % 4
+        if padding:
+            self.chunks.append(b"\0" * padding)
+            self.offset += padding
+        view = {'buffer': 0, 'byteOffset': self.offset, 'byteLength': len(data)}
+        if target:
+            view['target'] = target
+        self.chunks.append(data)
+        self.offset += len(data)
+        self.gltf['bufferViews'].append(view)
+        return len(self.gltf['bufferViews']) - 1
+
+    def accessor(self, array, kind, target):
+        array = np.ascontiguousarray(array)
+        accessor = {
+            'bufferView': self.view(array.tobytes(), target),
+            'componentType': UINT32 if array.dtype == np.uint32 else FLOAT,
+            'count': len(array), 'type': kind,
+        }
+        if kind == 'VEC3' and target == ARRAY_BUFFER:
+            accessor['min'] = array.min(axis=0).tolist()
+            accessor['max'] = array.max(axis=0).tolist()
+        self.gltf['accessors'].append(accessor)
+        return len(self.gltf['accessors']) - 1
+
+    def texture(self, png):
+        self.gltf['images'].append({'bufferView': self.view(png), 'mimeType': 'image/png'})
+        self.gltf['textures'].append({'source': len(self.gltf['images']) - 1, 'sampler': 0})
+        return len(self.gltf['textures']) - 1
+
+    def material(self, name, color, normal, metal_roughness):
+        self.gltf['materials'].append({
+            'name': name,
+            'pbrMetallicRoughness': {'baseColorTexture': {'index': color},
+                                     'metallicRoughnessTexture': {'index': metal_roughness}},
+            'normalTexture': {'index': normal},
+        })
+        return len(self.gltf['materials']) - 1
+
+    def mesh(self, name, positions, uvs, indices, material):
+        positions = positions.astype(np.float32)
+        attributes = {
+            'POSITION': self.accessor(positions, 'VEC3', ARRAY_BUFFER),
+            'NORMAL': self.accessor(vertex_normals(positions, indices).astype(np.float32), 'VEC3', ARRAY_BUFFER),
+            'TEXCOORD_0': self.accessor(uvs.astype(np.float32), 'VEC2', ARRAY_BUFFER),
+        }
+        indices_accessor = self.accessor(indices, 'SCALAR', ELEMENT_ARRAY_BUFFER)
+        self.gltf['meshes'].append({'name': name, 'primitives': [
+            {'attributes': attributes, 'indices': indices_accessor, 'material': material}]})
+        return len(self.gltf['meshes']) - 1
+
+    def node(self, **node):
+        self.gltf['nodes'].append(node)
+        return len(self.gltf['nodes']) - 1
+
+    def write(self, path):
+        binary = b"".join(self.chunks)
+        binary += b"\0" * ((-len(binary)) % 4)
+        self.gltf['buffers'][0]['byteLength'] = len(binary)
+        json_chunk = json.dumps(self.gltf, separators=(',', ':')).encode('utf-8')
+        json_chunk += b" " * ((-len(json_chunk)) % 4)
+        total = 12 + 8 + len(json_chunk) + 8 + len(binary)
+        with open(path, "wb") as f:
+            f.write(struct.pack("<4sII", b"glTF", 2, total))
+            f.write(struct.pack("<I4s", len(json_chunk), b"JSON") + json_chunk)
+            f.write(struct.pack("<I4s", len(binary), b"BIN\0") + binary)
+        return total
+
+
+def build_truck_glb(path, detail=1.0, texture_size=2048, seed=7):
+    """
+    Escribe el camión sintético en `path`. Devuelve el tamaño en bytes.
+    """
+    rng = np.random.default_rng(seed)
+    writer = GlbWriter()
+
+    def segments(n):
+        return max(8, int(n * detail))
+
+    body_size, tire_size = texture_size, max(64, texture_size // 2)
+    body = writer.material(
+        "carroceria",
+        writer.texture(png_bytes(paint_texture(body_size, (180, 30, 35), (235, 235, 235), rng))),
+        writer.texture(png_bytes(normal_texture(body_size, rng))),
+        writer.texture(png_bytes(metal_roughness_texture(body_size // 2, rng))),
+    )
+    tire = writer.material(
+        "llanta",
+        writer.texture(png_bytes(paint_texture(tire_size, (28, 28, 30), (60, 60, 64), rng))),
+        writer.texture(png_bytes(normal_texture(tire_size, rng))),
+        writer.texture(png_bytes(metal_roughness_texture(tire_size // 2, rng))),
+    )
+
+    parts = [
+        ("cabina", superquadric(segments(256), segments(256), (1.25, 1.5, 1.2), (0.25, 0.25)), body, [0, 2.3, 2.6]),
+        ("cofre", superquadric(segments(128), segments(128), (1.1, 0.7, 1.0), (0.4, 0.3)), body, [0, 1.6, 4.3]),
+        ("caja", superquadric(segments(160), segments(160), (1.3, 1.7, 4.5), (0.1, 0.1)), body, [0, 2.6, -3.4]),
+        ("chasis", superquadric(segments(64), segments(64), (0.6, 0.15, 6.5), (0.2, 0.2)), body, [0, 0.9, -0.6]),
+    ]
+    children = []
+    for name, (positions, uvs, indices), material, translation in parts:
+        children.append(writer.node(name=name, mesh=writer.mesh(name, positions, uvs, indices, material),
+                                    translation=translation))
+
+    # Ruedas: una sola malla instanciada en 10 nodos (como en muchos modelos exportados)
+    wheel_mesh = writer.mesh("rueda", *torus(segments(96), segments(48), 0.38, 0.14, 0.16), tire)
+    for axle_z in (4.3, 0.2, -0.9, -5.6, -6.7):
+        for side in (-1, 1):
+            children.append(writer.node(name=f"rueda_{axle_z:+.1f}_{side:+d}", mesh=wheel_mesh,
+                                        translation=[side * 1.05, 0.52, axle_z]))
+
+    writer.gltf['nodes'].insert(0, {'name': "camion", 'children': [c + 1 for c in children]})
+    return writer.write(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="Ruta del .glb a escribir")
+    parser.add_argument("--detail", type=float, default=1.0, help="Escala de la teselación (1.0 = ~230 mil triángulos)")
+    parser.add_argument("--texture-size", type=int, default=2048)
+    args = parser.parse_args()
+    size = build_truck_glb(args.output, args.detail, args.texture_size)
+    print(f"{args.output}: {size / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
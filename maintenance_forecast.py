@@ -0,0 +1,190 @@
+"""
+Pronóstico de mantenimiento por uso (horas de motor y odómetro) para toda la flota.
+
+Cada vehículo tiene una tasa de uso por métrica (horas/día, km/día) ajustada por
+mínimos cuadrados con ponderación exponencial en el tiempo (vida media
+configurable). El ajuste se guarda como sumas suficientes en arreglos de numpy, así
+que cada ciclo de datos solo suma las lecturas nuevas (vectorizado, sin reajustar
+el histórico) y el pronóstico es una operación sobre arreglos.
+
+Con la tasa y el intervalo de servicio de cada vehículo se proyecta cuándo alcanza
+el siguiente múltiplo del intervalo.
+"""
+import os
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+METRICS = ('engine_hours', 'odometer_km')
+_SUMS = ('w', 't', 'y', 'tt', 'ty')
+
+
+class UsageForecaster:
+    """
+    Tasas de uso incrementales por vehículo y proyección del próximo servicio.
+    """
+
+    def __init__(self, half_life_days=14.0, min_span_days=1.0):
+        self.half_life_days = half_life_days
+        self.min_span_days = min_span_days
+        self.epoch = None            # Referencia de tiempo (segundos) para que t sea pequeño
+        self.vehicle_ids = np.array([], dtype=object)
+        self._index = {}
+        self._state = {metric: self._empty(0) for metric in METRICS}
+
+    @staticmethod
+    def _empty(size):
+        state = {name: np.zeros(size) for name in _SUMS}
+        state['first_t'] = np.full(size, np.nan)
+        state['last_t'] = np.full(size, np.nan)
+        state['last_y'] = np.full(size, np.nan)
+        return state
+
+    def _indices(self, vehicle_ids):
+        """
+        Posición de cada vehículo en los arreglos (los nuevos se añaden al final).
+        """
+        new_ids = [vid for vid in dict.fromkeys(vehicle_ids) if vid not in self._index]
+        if new_ids:
+            start = len(self.vehicle_ids)
+            self._index.update((vid, start + i) for i, vid in enumerate(new_ids))
+            self.vehicle_ids = np.concatenate([self.vehicle_ids, np.array(new_ids, dtype=object)])
+            extra = self._empty(len(new_ids))
+            for metric in METRICS:
+                for name, values in extra.items():
+                    self._state[metric][name] = np.concatenate([self._state[metric][name], values])
+        return np.fromiter((self._index[vid] for vid in vehicle_ids), dtype=np.intp, count=len(vehicle_ids))
+
+    def update(self, vehicle_ids, timestamp, readings):
+        """
+        Añade una lectura por vehículo y métrica.
+
+        - vehicle_ids: secuencia de IDs.
+        - timestamp: segundos epoch de las lecturas; un valor para todas o un array
+          alineado con vehicle_ids (la hora de cada lectura). NaN = sin lectura.
+        - readings: {'engine_hours': array, 'odometer_km': array}; NaN = sin lectura.
+          Las métricas que no vienen no se tocan.
+        """
+        idx = self._indices(vehicle_ids)
+        timestamps = np.broadcast_to(np.asarray(timestamp, dtype=float), idx.shape)
+        if self.epoch is None:
+            if np.all(np.isnan(timestamps)):
+                return
+            self.epoch = float(np.nanmin(timestamps))
+        t_all = (timestamps - self.epoch) / SECONDS_PER_DAY
+
+        for metric in METRICS:
+            if metric not in readings:
+                continue
+            y = np.asarray(readings[metric], dtype=float)
+            state = self._state[metric]
+            last_t = state['last_t'][idx]
+            # Solo lecturas válidas y posteriores a la última registrada (una lectura que
+            # no cambió desde el ciclo anterior trae la misma hora y se descarta)
+            valid = ~np.isnan(y) & ~np.isnan(t_all) & ~(last_t >= t_all)
+            rows, y, t = idx[valid], y[valid], t_all[valid]
+            if rows.size == 0:
+                continue
+
+            # Decaimiento exponencial de lo acumulado según el tiempo transcurrido
+            elapsed = np.where(np.isnan(state['last_t'][rows]), 0.0, t - state['last_t'][rows])
+            decay = np.power(0.5, elapsed / self.half_life_days)
+            state['w'][rows] = state['w'][rows] * decay + 1.0
+            state['t'][rows] = state['t'][rows] * decay + t
+            state['y'][rows] = state['y'][rows] * decay + y
+            state['tt'][rows] = state['tt'][rows] * decay + t * t
+            state['ty'][rows] = state['ty'][rows] * decay + t * y
+
+            state['first_t'][rows] = np.where(np.isnan(state['first_t'][rows]), t, state['first_t'][rows])
+            state['last_t'][rows] = t
+            state['last_y'][rows] = y
+
+    def rates(self, metric, idx=None):
+        """
+        Tasa de uso por día (pendiente del ajuste); NaN sin historial suficiente.
+        """
+        state = self._state[metric]
+        sl = slice(None) if idx is None else idx
+        w, st, sy, stt, sty = (state[name][sl] for name in _SUMS)
+        denominator = w * stt - st * st
+        span = state['last_t'][sl] - state['first_t'][sl]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (w * sty - st * sy) / denominator
+        enough = (span >= self.min_span_days) & (denominator > 1e-12)
+        # Un odómetro o un horómetro no retroceden: tasas negativas (reseteos) cuentan como 0
+        return np.where(enough, np.maximum(slope, 0.0), np.nan)
+
+    def forecast(self, vehicle_ids, intervals):
+        """
+        Proyecta el próximo servicio de cada vehículo.
+
+        - intervals: {'engine_hours': array, 'odometer_km': array} con el intervalo de
+          servicio de cada vehículo (NaN = la métrica no aplica).
+
+        Devuelve un dict de arreglos alineados con vehicle_ids: current_<m>, rate_<m>,
+        next_due_<m>, days_<m> por métrica, y days_until_due / due_metric (la primera
+        métrica en vencer).
+        """
+        idx = self._indices(vehicle_ids)
+        result = {}
+        days_by_metric = []
+        for metric in METRICS:
+            interval = np.asarray(intervals[metric], dtype=float)
+            current = self._state[metric]['last_y'][idx]
+            rate = self.rates(metric, idx)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                next_due = (np.floor(current / interval) + 1.0) * interval
+                remaining = next_due - current
+                days = np.where(rate > 0, remaining / rate, np.inf)
+            days = np.where(np.isnan(current) | np.isnan(interval) | (interval <= 0) | np.isnan(rate), np.nan, days)
+            result[f'current_{metric}'] = current
+            result[f'rate_{metric}'] = rate
+            result[f'next_due_{metric}'] = next_due
+            result[f'days_{metric}'] = days
+            days_by_metric.append(days)
+
+        stacked = np.vstack(days_by_metric)
+        all_nan = np.all(np.isnan(stacked), axis=0)
+        filled = np.where(np.isnan(stacked), np.inf, stacked)
+        result['days_until_due'] = np.where(all_nan, np.nan, filled.min(axis=0))
+        result['due_metric'] = np.where(all_nan, None, np.array(METRICS, dtype=object)[filled.argmin(axis=0)])
+        return result
+
+    def save(self, path):
+        """
+        Persiste el estado (sumas y referencias) en un .npz, de forma atómica.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        arrays = {
+            f"{metric}__{name}": values
+            for metric in METRICS for name, values in self._state[metric].items()
+        }
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, vehicle_ids=self.vehicle_ids.astype(str),
+                 epoch=np.array([np.nan if self.epoch is None else self.epoch]),
+                 half_life_days=np.array([self.half_life_days]), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, half_life_days=14.0, min_span_days=1.0):
+        """
+        Carga el estado guardado; si no existe, no coincide la vida media o está dañado,
+        empieza de cero.
+        """
+        forecaster = cls(half_life_days, min_span_days)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if float(data['half_life_days'][0]) != half_life_days:
+                    return forecaster
+                vehicle_ids = data['vehicle_ids'].astype(object)
+                state = {metric: {name: data[f"{metric}__{name}"] for name in cls._empty(0)} for metric in METRICS}
+                epoch = float(data['epoch'][0])
+        except (OSError, KeyError, ValueError):
+            return forecaster
+        forecaster.vehicle_ids = vehicle_ids
+        forecaster._index = {vid: i for i, vid in enumerate(vehicle_ids)}
+        forecaster._state = state
+        forecaster.epoch = None if np.isnan(epoch) else epoch
+        return forecaster
@@ -0,0 +1,177 @@
+"""
+Decodificación de respuestas de la API de Samsara.
+
+Solo se materializan los campos que usa el gemelo digital. Dos estrategias:
+
+- Página completa (por defecto): se decodifica todo el cuerpo y se proyectan los
+  campos. Es el camino con menos CPU cuando se conserva la mayor parte de la página.
+- Streaming con ijson (stream=True, opcional): los items que no pasan keep_item se
+  saltan sin construir sus diccionarios y la memoria pico no depende del tamaño de
+  la página, pero cuesta 3-9x más CPU. Solo compensa cuando se conserva una parte
+  pequeña de una página grande; la app conserva todo el roster y no lo usa
+  (benchmarks/bench_decode.py mide ambos caminos).
+
+orjson se usa solo para cuerpos de hasta ORJSON_MAX_BYTES: reserva un documento
+intermedio (yyjson) de hasta 16 bytes por byte de entrada y su pico real de memoria
+ronda 3x el cuerpo, frente a ~1x del json de la librería estándar. En páginas
+pequeñas ese extra es despreciable y es ~2x más rápido; en las grandes se usa json.
+
+Sin ijson no hay streaming; sin orjson, siempre el json de la librería estándar.
+"""
+import json
+
+import requests
+import urllib3
+
+try:
+    import orjson
+except ImportError:  # Backend opcional: json de la librería estándar
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # Sin ijson no hay streaming: se decodifica la página completa
+    ijson = None
+
+# Cuerpos más grandes se decodifican con json (menos memoria pico que orjson)
+ORJSON_MAX_BYTES = 1 << 20
+
+
+def decode_json(response):
+    """
+    Decodifica el cuerpo completo de una respuesta: orjson en cuerpos pequeños,
+    json de la librería estándar en los grandes (ver ORJSON_MAX_BYTES).
+    """
+    content = response.content
+    try:
+        if orjson is not None and len(content) <= ORJSON_MAX_BYTES:
+            return orjson.loads(content)
+        return json.loads(content)
+    except ValueError as e:
+        raise requests.exceptions.InvalidJSONError(f"Respuesta JSON inválida de {response.url}: {e}") from e
+
+
+def project_fields(item, fields):
+    """
+    Copia de `item` con solo las rutas de `fields` (ej. 'j1939.checkEngineLight').
+    """
+    projected = {}
+    for field in fields:
+        source, target = item, projected
+        parts = field.split('.')
+        for part in parts[:-1]:
+            source = source.get(part) if isinstance(source, dict) else None
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(part, {})
+        else:
+            if isinstance(source, dict) and parts[-1] in source:
+                target[parts[-1]] = source[parts[-1]]
+    return projected
+
+
+def decode_page(response, items_keys, fields, keep_item=None, stream=False):
+    """
+    Decodifica una página de la API.
+
+    - items_keys: claves de primer nivel donde vienen los items (ej. ('data',)).
+    - fields: rutas relativas al item que se materializan (el resto se descarta).
+    - keep_item: función que recibe el 'id' del item y decide si se conserva.
+    - stream: decodificar en streaming con ijson (si está instalado). Solo conviene
+      cuando keep_item descarta la mayor parte de una página grande.
+
+    Devuelve (items, end_cursor). La petición HTTP debe hacerse con stream=True (requests).
+    """
+    try:
+        if stream and ijson is not None:
+            return _stream_page(response, items_keys, fields, keep_item)
+
+        data = decode_json(response)
+        items = []
+        for key in items_keys:
+            items = data.get(key) or []
+            if items:
+                break
+        projected = [
+            project_fields(item, fields) for item in items
+            if keep_item is None or keep_item(item.get('id'))
+        ]
+        return projected, (data.get('pagination') or {}).get('endCursor')
+    finally:
+        response.close()
+
+
+def _field_matcher(fields):
+    """
+    Devuelve una función que dice si una ruta del item hay que materializarla:
+    es uno de los campos, está dentro de uno, o es un ancestro de alguno.
+    """
+    fields = tuple(fields)
+    descendant_prefixes = tuple(f"{field}." for field in fields)
+    ancestors = set()
+    for field in fields:
+        parts = field.split('.')
+        for i in range(1, len(parts)):
+            ancestors.add('.'.join(parts[:i]))
+
+    def matches(path):
+        return path in ancestors or path in fields or path.startswith(descendant_prefixes)
+
+    return matches
+
+
+def _stream_page(response, items_keys, fields, keep_item):
+    matches = _field_matcher(fields)
+    item_prefixes = {f"{key}.item" for key in items_keys}
+
+    items = []
+    end_cursor = None
+    builder = None       # ObjectBuilder del item en curso
+    item_prefix = None
+    skipping = False     # El item en curso no interesa: se ignoran sus eventos
+
+    response.raw.decode_content = True  # Descomprime gzip al vuelo
+    try:
+        for prefix, event, value in ijson.parse(response.raw, use_float=True):
+            if item_prefix is None:
+                if event == 'start_map' and prefix in item_prefixes:
+                    item_prefix = prefix
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                elif prefix == 'pagination.endCursor':
+                    end_cursor = value
+                continue
+
+            if prefix == item_prefix:
+                if event == 'end_map':
+                    if not skipping:
+                        builder.event(event, value)
+                        items.append(builder.value)
+                    item_prefix, builder, skipping = None, None, False
+                    continue
+                if skipping:
+                    continue
+                # map_key de primer nivel del item
+                if matches(value):
+                    builder.event(event, value)
+                continue
+
+            if skipping:
+                continue
+
+            path = prefix[len(item_prefix) + 1:]
+            if event == 'map_key':
+                if matches(f"{path}.{value}"):
+                    builder.event(event, value)
+            elif matches(path):
+                if path == 'id' and keep_item is not None and not keep_item(value):
+                    skipping = True
+                    continue
+                builder.event(event, value)
+    except ijson.JSONError as e:
+        raise requests.exceptions.InvalidJSONError(f"Respuesta JSON inválida de {response.url}: {e}") from e
+    except (urllib3.exceptions.HTTPError, OSError) as e:
+        # Errores de lectura del socket durante el streaming
+        raise requests.exceptions.ConnectionError(f"Error leyendo la respuesta de {response.url}: {e}") from e
+
+    return items, end_cursor
@@ -5,5 +5,9 @@ echo "\
 headless = true\n\
 port = $PORT\n\
 enableCORS = false\n\
+enableStaticServing = true\n\
+\n\
+[runner]\n\
+magicEnabled = false\n\
 \n\
 " > ~/.streamlit/config.toml
\ No newline at end of file
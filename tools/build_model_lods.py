@@ -0,0 +1,637 @@
+"""
+Pipeline offline de niveles de detalle (LOD) para los modelos 3D de MODEL_MAP.
+
+Para cada .glb de origen genera variantes más ligeras y las deja en
+static/modelos_3d/ con el hash del contenido en el nombre:
+
+- geometría simplificada con meshoptimizer (el simplificador conserva los vértices
+  originales, así que normales y UVs no se deforman), reordenada para la caché de
+  vértices y cuantizada con KHR_mesh_quantization (posiciones int16, normales int8,
+  UVs uint16), que three.js y model-viewer leen sin decodificador adicional;
+- texturas reducidas y recodificadas en WebP (EXT_texture_webp).
+
+El manifiesto static/modelos_3d/manifest.json asocia la ruta de origen (la de
+MODEL_MAP) con sus variantes, en orden de nivel. app.py sirve primero 'bajo' y,
+cuando termina de cargar, salta directamente a la mejor variante para el
+devicePixelRatio de la pantalla, sin pasar por las intermedias.
+
+Las variantes se reutilizan mientras no cambien ni el .glb de origen ni los
+ajustes del nivel (caché por hash).
+
+Bytes por vista de detalle: 'bajo' más la variante final de esa pantalla. Se
+informan por modelo (y quedan en el manifiesto como 'view_bytes') para pantallas
+normales (1x) y HiDPI (2x), junto al tamaño de 'bajo' (lo que hay que bajar para
+el primer frame).
+
+Con --vendor descarga además el script de model-viewer (versión fija) en
+static/vendor/, para no depender de unpkg en cada render.
+
+Uso:
+    python tools/build_model_lods.py                    # modelos_3d/*.glb y *.glb de la raíz
+    python tools/build_model_lods.py truck5.glb --vendor
+    python tools/build_model_lods.py --force
+
+Requiere numpy, Pillow (con WebP) y meshoptimizer (pip install meshoptimizer),
+solo para este script.
+"""
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import urllib.request
+
+import numpy as np
+from PIL import Image
+
+try:
+    import meshoptimizer
+except ImportError:  # Se comprueba en main() con un mensaje claro
+    meshoptimizer = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(REPO_ROOT, "static")
+
+# Niveles de menor a mayor. El visor es un panel de 500 px de alto: 'medio' es la
+# variante final en pantallas normales y 'alto' solo se pide con devicePixelRatio
+# >= 2 (ver app.py). Ningún nivel conserva la malla ni las texturas completas.
+LOD_LEVELS = [
+    {'lod': 'bajo', 'simplify_ratio': 0.1, 'simplify_error': 0.01, 'texture_size': 256, 'texture_quality': 75,
+     'min_pixel_ratio': 0},
+    {'lod': 'medio', 'simplify_ratio': 0.3, 'simplify_error': 0.005, 'texture_size': 512, 'texture_quality': 80,
+     'min_pixel_ratio': 0},
+    {'lod': 'alto', 'simplify_ratio': 0.5, 'simplify_error': 0.002, 'texture_size': 1024, 'texture_quality': 80,
+     'min_pixel_ratio': 2},
+]
+
+# Misma versión que MODEL_VIEWER_CDN_URL en app.py
+VENDOR_FILES = {
+    'model_viewer': ("https://unpkg.com/@google/model-viewer@4.0.0/dist/model-viewer.min.js",
+                     "model-viewer-4.0.0.min.js"),
+}
+
+# Extensiones que este pipeline no sabe reescribir (geometría o texturas ya comprimidas)
+UNSUPPORTED_EXTENSIONS = {'KHR_draco_mesh_compression', 'EXT_meshopt_compression', 'KHR_texture_basisu'}
+
+COMPONENT_DTYPES = {5120: np.int8, 5121: np.uint8, 5122: np.int16, 5123: np.uint16, 5125: np.uint32, 5126: np.float32}
+COMPONENT_TYPES = {np.dtype(dtype): component for component, dtype in COMPONENT_DTYPES.items()}
+TYPE_WIDTHS = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER = 34962, 34963
+TRIANGLES = 4
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r", encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {'models': {}, 'vendor': {}}
+
+
+def save_manifest(manifest_path, manifest):
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+# --- LECTURA Y ESCRITURA DE .glb ---
+def read_glb(path):
+    """
+    Devuelve (gltf, binario) de un .glb autocontenido (un único buffer embebido).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, length = struct.unpack_from("<4sII", data, 0)
+    if magic != b"glTF" or version != 2:
+        raise ValueError(f"{path} no es un .glb de glTF 2.0")
+    gltf, binary, offset = None, b"", 12
+    while offset < length:
+        chunk_length, chunk_type = struct.unpack_from("<I4s", data, offset)
+        chunk = data[offset + 8:offset + 8 + chunk_length]
+        offset += 8 + chunk_length
+        if chunk_type == b"JSON":
+            gltf = json.loads(chunk)
+        elif chunk_type == b"BIN\0":
+            binary = chunk
+
+    if gltf is None:
+        raise ValueError(f"{path} no tiene bloque JSON")
+    if any('uri' in buffer for buffer in gltf.get('buffers', [])):
+        raise ValueError(f"{path} usa buffers externos: solo se admiten .glb autocontenidos")
+    unsupported = UNSUPPORTED_EXTENSIONS.intersection(gltf.get('extensionsUsed', []))
+    if unsupported:
+        raise ValueError(f"{path} ya usa {', '.join(sorted(unsupported))}: no soportado")
+    return gltf, binary
+
+
+def _read_view(gltf, binary, view_index, byte_offset, dtype, count, width):
+    view = gltf['bufferViews'][view_index]
+    element_size = dtype.itemsize * width
+    stride = view.get('byteStride') or element_size
+    start = view.get('byteOffset', 0) + byte_offset
+    if count == 0:
+        return np.zeros((0, width), dtype)
+    raw = np.frombuffer(binary, np.uint8, count=(count - 1) * stride + element_size, offset=start)
+    rows = np.lib.stride_tricks.as_strided(raw, (count, element_size), (stride, 1))
+    return np.ascontiguousarray(rows).view(dtype).reshape(count, width)
+
+
+def read_accessor(gltf, binary, index, dequantize=True):
+    """
+    Valores de un accessor como arreglo (count, ancho). Con dequantize, los enteros
+    normalizados se convierten a float32 según la especificación.
+    """
+    accessor = gltf['accessors'][index]
+    dtype = np.dtype(COMPONENT_DTYPES[accessor['componentType']])
+    width = TYPE_WIDTHS[accessor['type']]
+    count = accessor['count']
+    if 'bufferView' in accessor:
+        values = _read_view(gltf, binary, accessor['bufferView'], accessor.get('byteOffset', 0), dtype, count, width)
+    else:
+        values = np.zeros((count, width), dtype)
+
+    sparse = accessor.get('sparse')
+    if sparse:
+        index_dtype = np.dtype(COMPONENT_DTYPES[sparse['indices']['componentType']])
+        rows = _read_view(gltf, binary, sparse['indices']['bufferView'], sparse['indices'].get('byteOffset', 0),
+                          index_dtype, sparse['count'], 1).ravel()
+        values = values.copy()
+        values[rows] = _read_view(gltf, binary, sparse['values']['bufferView'],
+                                  sparse['values'].get('byteOffset', 0), dtype, sparse['count'], width)
+
+    if dequantize and accessor.get('normalized'):
+        if dtype.kind == 'i':
+            values = np.maximum(values / np.float32(np.iinfo(dtype).max), -1.0).astype(np.float32)
+        else:
+            values = (values / np.float32(np.iinfo(dtype).max)).astype(np.float32)
+    return values
+
+
+class GlbBuilder:
+    """
+    Nuevo buffer binario: bufferViews alineados a 4 bytes y accessors compactos.
+    """
+
+    def __init__(self):
+        self.views, self.accessors, self.chunks = [], [], []
+        self.offset = 0
+
+    def view(self, data, target=None, stride=None):
+        padding = (-self.offset) % 4
+        if padding:
+            self.chunks.append(b"\0" * padding)
+            self.offset += padding
+        view = {'buffer': 0, 'byteOffset': self.offset, 'byteLength': len(data)}
+        if target:
+            view['target'] = target
+        if stride:
+            view['byteStride'] = stride
+        self.chunks.append(data)
+        self.offset += len(data)
+        self.views.append(view)
+        return len(self.views) - 1
+
+    def accessor(self, values, accessor_type, target=None, normalized=False, with_bounds=False, pad_to=None):
+        """
+        Escribe `values` (count, ancho). pad_to rellena cada elemento hasta ese número
+        de componentes (los atributos de vértice deben ir alineados a 4 bytes).
+        """
+        values = np.ascontiguousarray(values)
+        count, width = values.shape
+        data = values
+        stride = None
+        if pad_to and pad_to > width:
+            data = np.zeros((count, pad_to), values.dtype)
+            data[:, :width] = values
+            stride = pad_to * values.dtype.itemsize
+        accessor = {
+            'bufferView': self.view(data.tobytes(), target, stride),
+            'componentType': COMPONENT_TYPES[values.dtype],
+            'count': count,
+            'type': accessor_type,
+        }
+        if normalized:
+            accessor['normalized'] = True
+        if with_bounds and count:
+            cast = float if values.dtype.kind == 'f' else int
+            accessor['min'] = [cast(v) for v in values.min(axis=0)]
+            accessor['max'] = [cast(v) for v in values.max(axis=0)]
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+    def write(self, gltf, path):
+        binary = b"".join(self.chunks)
+        binary += b"\0" * ((-len(binary)) % 4)
+        gltf['buffers'] = [{'byteLength': len(binary)}]
+        gltf['bufferViews'] = self.views
+        gltf['accessors'] = self.accessors
+        json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+        json_chunk += b" " * ((-len(json_chunk)) % 4)
+        with open(path, "wb") as f:
+            f.write(struct.pack("<4sII", b"glTF", 2, 12 + 8 + len(json_chunk) + 8 + len(binary)))
+            f.write(struct.pack("<I4s", len(json_chunk), b"JSON") + json_chunk)
+            f.write(struct.pack("<I4s", len(binary), b"BIN\0") + binary)
+
+
+# --- GEOMETRÍA ---
+def simplify_primitive(attributes, indices, level):
+    """
+    Simplifica (si el nivel lo pide) y reordena una primitiva de triángulos. Devuelve
+    (atributos, índices) con solo los vértices usados, en orden de acceso.
+    """
+    positions = np.ascontiguousarray(attributes['POSITION'], dtype=np.float32)
+    indices = np.ascontiguousarray(indices, dtype=np.uint32)
+    if level['simplify_ratio'] < 1.0 and len(indices) >= 3:
+        target = max(3, int(len(indices) * level['simplify_ratio']) // 3 * 3)
+        simplified = np.zeros(len(indices), dtype=np.uint32)
+        count = meshoptimizer.simplify(simplified, indices, positions, target_index_count=target,
+                                       target_error=level['simplify_error'])
+        if count >= 3:  # Piezas pequeñas que desaparecerían: se quedan como están
+            indices = simplified[:count]
+
+    optimized = np.zeros(len(indices), dtype=np.uint32)
+    meshoptimizer.optimize_vertex_cache(optimized, indices, vertex_count=len(positions))
+    remap = np.zeros(len(positions), dtype=np.uint32)
+    unique = meshoptimizer.optimize_vertex_fetch_remap(remap, optimized, vertex_count=len(positions))
+    used = remap != np.uint32(0xFFFFFFFF)
+    order = np.empty(unique, dtype=np.int64)
+    order[remap[used]] = np.flatnonzero(used)
+    return {name: values[order] for name, values in attributes.items()}, remap[optimized]
+
+
+def aligned_width(values):
+    """
+    Componentes por elemento para que cada vértice ocupe un múltiplo de 4 bytes.
+    """
+    itemsize = values.dtype.itemsize
+    return -(-values.shape[1] * itemsize // 4) * 4 // itemsize
+
+
+def quantize_unit(values, dtype):
+    """
+    Valores en [-1, 1] (o [0, 1] para enteros sin signo) a enteros normalizados.
+    """
+    limit = np.iinfo(dtype).max
+    return np.clip(np.round(values * limit), -limit if np.dtype(dtype).kind == 'i' else 0, limit).astype(dtype)
+
+
+def write_attribute(builder, name, values, position_transform):
+    """
+    Escribe un atributo de vértice cuantizado cuando KHR_mesh_quantization lo permite.
+    position_transform = (centro, escala) si las posiciones de la malla se cuantizan.
+    """
+    width = values.shape[1]
+    accessor_type = ('SCALAR', 'VEC2', 'VEC3', 'VEC4')[width - 1]
+    if values.dtype.kind != 'f':
+        return builder.accessor(values, accessor_type, ARRAY_BUFFER, normalized=name.startswith('COLOR_'),
+                                pad_to=aligned_width(values))
+    if name == 'POSITION':
+        if position_transform is None:
+            return builder.accessor(values.astype(np.float32), accessor_type, ARRAY_BUFFER, with_bounds=True)
+        center, scale = position_transform
+        quantized = quantize_unit((values - center) / scale, np.int16)
+        return builder.accessor(quantized, accessor_type, ARRAY_BUFFER, normalized=True, with_bounds=True, pad_to=4)
+    if name == 'NORMAL':
+        lengths = np.linalg.norm(values, axis=1, keepdims=True)
+        unit = np.divide(values, lengths, out=np.zeros_like(values), where=lengths > 0)
+        return builder.accessor(quantize_unit(unit, np.int8), accessor_type, ARRAY_BUFFER, normalized=True, pad_to=4)
+    if name == 'TANGENT':
+        return builder.accessor(quantize_unit(np.clip(values, -1, 1), np.int8), accessor_type, ARRAY_BUFFER,
+                                normalized=True)
+    if name.startswith('TEXCOORD_') and values.size and values.min() >= 0 and values.max() <= 1:
+        return builder.accessor(quantize_unit(values, np.uint16), accessor_type, ARRAY_BUFFER, normalized=True)
+    return builder.accessor(values.astype(np.float32), accessor_type, ARRAY_BUFFER)
+
+
+def write_indices(builder, indices, vertex_count):
+    dtype = np.uint16 if vertex_count <= 0xFFFF else np.uint32
+    return builder.accessor(indices.astype(dtype).reshape(-1, 1), 'SCALAR', ELEMENT_ARRAY_BUFFER)
+
+
+def quantizable_meshes(gltf):
+    """
+    Mallas cuyas posiciones se pueden cuantizar: la descuantización va en un nodo hijo,
+    así que se excluyen las que tienen morph targets, skin o instancias por GPU.
+    """
+    excluded = set()
+    for node in gltf.get('nodes', []):
+        if 'mesh' in node and ('skin' in node or 'EXT_mesh_gpu_instancing' in node.get('extensions', {})):
+            excluded.add(node['mesh'])
+    for index, mesh in enumerate(gltf.get('meshes', [])):
+        if any('targets' in p or p.get('mode', TRIANGLES) != TRIANGLES for p in mesh['primitives']):
+            excluded.add(index)
+    return set(range(len(gltf.get('meshes', [])))) - excluded
+
+
+def rebuild_geometry(gltf, binary, builder, level):
+    """
+    Reescribe todas las mallas (y copia el resto de accessors) en `builder`.
+    Devuelve {malla: (centro, escala)} de las mallas con posiciones cuantizadas.
+    """
+    copied = {}
+
+    def copy_accessor(index, target=None):
+        # byteStride (relleno) solo se permite en atributos de vértice
+        if index not in copied:
+            accessor = gltf['accessors'][index]
+            values = read_accessor(gltf, binary, index, dequantize=False)
+            new_index = builder.accessor(values, accessor['type'], target, accessor.get('normalized', False),
+                                         pad_to=aligned_width(values) if target == ARRAY_BUFFER else None)
+            for bound in ('min', 'max'):
+                if bound in accessor:
+                    builder.accessors[new_index][bound] = accessor[bound]
+            copied[index] = new_index
+        return copied[index]
+
+    quantizable = quantizable_meshes(gltf)
+    transforms = {}
+    for mesh_index, mesh in enumerate(gltf.get('meshes', [])):
+        primitives = []
+        for primitive in mesh['primitives']:
+            if mesh_index not in quantizable:
+                # Se copia tal cual (morph targets, skin o líneas/puntos)
+                primitive['attributes'] = {name: copy_accessor(i, ARRAY_BUFFER)
+                                           for name, i in primitive['attributes'].items()}
+                if 'indices' in primitive:
+                    primitive['indices'] = copy_accessor(primitive['indices'], ELEMENT_ARRAY_BUFFER)
+                if 'targets' in primitive:
+                    primitive['targets'] = [{name: copy_accessor(i, ARRAY_BUFFER) for name, i in target.items()}
+                                            for target in primitive['targets']]
+                continue
+            attributes = {name: read_accessor(gltf, binary, i) for name, i in primitive['attributes'].items()}
+            if 'indices' in primitive:
+                indices = read_accessor(gltf, binary, primitive['indices']).ravel()
+            else:
+                indices = np.arange(len(attributes['POSITION']), dtype=np.uint32)
+            primitives.append((primitive, *simplify_primitive(attributes, indices, level)))
+
+        if not primitives:
+            continue
+        # Una sola transformación por malla (uniforme, para no deformar las normales)
+        all_positions = np.concatenate([attrs['POSITION'] for _, attrs, _ in primitives])
+        low, high = all_positions.min(axis=0), all_positions.max(axis=0)
+        center = ((low + high) / 2).astype(np.float32)
+        scale = float(max((high - low).max() / 2, 1e-6))
+        transforms[mesh_index] = (center, scale)
+        for primitive, attributes, indices in primitives:
+            primitive['attributes'] = {name: write_attribute(builder, name, values, transforms[mesh_index])
+                                       for name, values in attributes.items()}
+            primitive['indices'] = write_indices(builder, indices, len(attributes['POSITION']))
+            primitive.pop('mode', None)
+
+    for skin in gltf.get('skins', []):
+        if 'inverseBindMatrices' in skin:
+            skin['inverseBindMatrices'] = copy_accessor(skin['inverseBindMatrices'])
+    for animation in gltf.get('animations', []):
+        for sampler in animation['samplers']:
+            sampler['input'] = copy_accessor(sampler['input'])
+            sampler['output'] = copy_accessor(sampler['output'])
+    return transforms
+
+
+def add_dequantization_nodes(gltf, transforms):
+    """
+    Mueve cada malla cuantizada a un nodo hijo con la traslación/escala que devuelve
+    sus posiciones a las unidades originales.
+    """
+    nodes = gltf.get('nodes', [])
+    for node in list(nodes):
+        mesh_index = node.get('mesh')
+        if mesh_index not in transforms:
+            continue
+        center, scale = transforms[mesh_index]
+        nodes.append({'mesh': node.pop('mesh'), 'translation': [float(c) for c in center], 'scale': [scale] * 3})
+        node.setdefault('children', []).append(len(nodes) - 1)
+
+
+def triangle_count(gltf):
+    """
+    Triángulos dibujados (cuenta cada instancia de una malla).
+    """
+    per_mesh = []
+    for mesh in gltf.get('meshes', []):
+        total = 0
+        for primitive in mesh['primitives']:
+            if primitive.get('mode', TRIANGLES) != TRIANGLES:
+                continue
+            if 'indices' in primitive:
+                total += gltf['accessors'][primitive['indices']]['count'] // 3
+            else:
+                total += gltf['accessors'][primitive['attributes']['POSITION']]['count'] // 3
+        per_mesh.append(total)
+    return sum(per_mesh[node['mesh']] for node in gltf.get('nodes', []) if 'mesh' in node)
+
+
+# --- TEXTURAS ---
+def rebuild_textures(gltf, binary, builder, level):
+    """
+    Reduce cada imagen a texture_size como máximo y la recodifica en WebP.
+    """
+    for image in gltf.get('images', []):
+        if 'bufferView' not in image:
+            continue
+        view = gltf['bufferViews'][image['bufferView']]
+        start = view.get('byteOffset', 0)
+        picture = Image.open(io.BytesIO(binary[start:start + view['byteLength']]))
+        picture.load()
+        has_alpha = picture.mode in ('RGBA', 'LA') or (picture.mode == 'P' and 'transparency' in picture.info)
+        picture = picture.convert('RGBA' if has_alpha else 'RGB')
+        if has_alpha and picture.getchannel('A').getextrema() == (255, 255):
+            picture = picture.convert('RGB')
+        if max(picture.size) > level['texture_size']:
+            factor = level['texture_size'] / max(picture.size)
+            picture = picture.resize((max(1, round(picture.width * factor)), max(1, round(picture.height * factor))),
+                                     Image.LANCZOS)
+        encoded = io.BytesIO()
+        picture.save(encoded, format='WEBP', quality=level['texture_quality'], method=4)
+        image['bufferView'] = builder.view(encoded.getvalue())
+        image['mimeType'] = 'image/webp'
+
+    for texture in gltf.get('textures', []):
+        if 'source' in texture:
+            texture.setdefault('extensions', {})['EXT_texture_webp'] = {'source': texture.pop('source')}
+
+
+def build_variant(source_abs, target, level):
+    """
+    Escribe una variante LOD de `source_abs` en `target`. Devuelve sus triángulos.
+    """
+    gltf, binary = read_glb(source_abs)
+    builder = GlbBuilder()
+    transforms = rebuild_geometry(gltf, binary, builder, level)
+    add_dequantization_nodes(gltf, transforms)
+    rebuild_textures(gltf, binary, builder, level)
+
+    extensions = set(gltf.get('extensionsUsed', [])) | {'EXT_texture_webp'}
+    if transforms:
+        extensions.add('KHR_mesh_quantization')
+    gltf['extensionsUsed'] = sorted(extensions)
+    required = set(gltf.get('extensionsRequired', [])) | ({'KHR_mesh_quantization'} if transforms else set())
+    if gltf.get('textures'):
+        required.add('EXT_texture_webp')
+    if required:
+        gltf['extensionsRequired'] = sorted(required)
+    gltf.setdefault('asset', {})['generator'] = "tools/build_model_lods.py"
+    builder.write(gltf, target)
+    return triangle_count(gltf)
+
+
+# --- VARIANTES Y MANIFIESTO ---
+def best_variant(variants, pixel_ratio):
+    """
+    Variante final para un devicePixelRatio: la de mayor nivel que le corresponde
+    (la misma regla que el script del visor en app.py).
+    """
+    eligible = [v for v in variants if pixel_ratio >= v['min_pixel_ratio']]
+    return eligible[-1] if eligible else variants[0]
+
+
+def view_bytes(variants, pixel_ratio):
+    """
+    Bytes que descarga una vista de detalle: la primera variante y, si es otra, la
+    final para ese devicePixelRatio (ver display_gltf_viewer en app.py).
+    """
+    first, best = variants[0], best_variant(variants, pixel_ratio)
+    return first['bytes'] + (best['bytes'] if best is not first else 0)
+
+
+def build_model(source_rel, manifest, static_dir, force=False):
+    """
+    Genera (o reutiliza) las variantes de un modelo. Devuelve la entrada del manifiesto.
+    """
+    source_abs = os.path.join(REPO_ROOT, source_rel)
+    source_hash = sha256_file(source_abs)
+    settings_hash = hashlib.sha256(json.dumps(LOD_LEVELS, sort_keys=True).encode()).hexdigest()
+    cache_key = f"{source_hash}:{settings_hash}"
+
+    previous = manifest['models'].get(source_rel)
+    if (not force and previous and previous.get('cache_key') == cache_key
+            and all(os.path.exists(os.path.join(static_dir, v['path'])) for v in previous['variants'])):
+        print(f"= {source_rel}: sin cambios; {describe_sizes(previous)}")
+        return previous
+
+    gltf, _ = read_glb(source_abs)
+    stem = os.path.splitext(os.path.basename(source_rel))[0]
+    output_dir = os.path.join(static_dir, "modelos_3d")
+    os.makedirs(output_dir, exist_ok=True)
+    variants = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for level in LOD_LEVELS:
+            tmp_target = os.path.join(tmp_dir, f"{stem}.{level['lod']}.glb")
+            triangles = build_variant(source_abs, tmp_target, level)
+            content_hash = sha256_file(tmp_target)[:12]
+            rel_path = f"modelos_3d/{stem}.{level['lod']}.{content_hash}.glb"
+            shutil.move(tmp_target, os.path.join(static_dir, rel_path))
+            variants.append({
+                'lod': level['lod'],
+                'path': rel_path,
+                'bytes': os.path.getsize(os.path.join(static_dir, rel_path)),
+                'triangles': triangles,
+                'min_pixel_ratio': level['min_pixel_ratio'],
+            })
+
+    # Borrar variantes anteriores que ya no se usan
+    if previous:
+        current = {v['path'] for v in variants}
+        for old in previous['variants']:
+            old_path = os.path.join(static_dir, old['path'])
+            if old['path'] not in current and os.path.exists(old_path):
+                os.remove(old_path)
+
+    entry = {
+        'cache_key': cache_key,
+        'source_bytes': os.path.getsize(source_abs),
+        'source_triangles': triangle_count(gltf),
+        'variants': variants,
+        'view_bytes': {'1x': view_bytes(variants, 1), '2x': view_bytes(variants, 2)},
+    }
+    print(f"+ {source_rel}: {describe_sizes(entry)}")
+    return entry
+
+
+def describe_sizes(entry):
+    """
+    Resumen de tamaños frente al .glb de origen (lo que se servía antes en cada vista).
+    """
+    original = entry['source_bytes']
+
+    def ratio(size):
+        return f"{original / max(size, 1):.1f}x menos"
+
+    variants = entry['variants']
+    sizes = ", ".join(f"{v['lod']} {v['bytes'] / 1024:.0f} KB ({v.get('triangles', 0):,} tri)" for v in variants)
+    first = variants[0]['bytes']
+    view_1x, view_2x = entry['view_bytes']['1x'], entry['view_bytes']['2x']
+    return (f"origen {original / 1024:.0f} KB ({entry.get('source_triangles', 0):,} tri); variantes: {sizes}; "
+            f"primer frame {first / 1024:.0f} KB ({ratio(first)}); "
+            f"vista 1x {view_1x / 1024:.0f} KB ({ratio(view_1x)}), "
+            f"2x {view_2x / 1024:.0f} KB ({ratio(view_2x)})")
+
+
+def vendor_scripts(manifest, static_dir):
+    vendor_dir = os.path.join(static_dir, "vendor")
+    os.makedirs(vendor_dir, exist_ok=True)
+    for key, (url, filename) in VENDOR_FILES.items():
+        target = os.path.join(vendor_dir, filename)
+        if not os.path.exists(target):
+            print(f"Descargando {url}")
+            with urllib.request.urlopen(url, timeout=60) as response, open(target, "wb") as f:
+                shutil.copyfileobj(response, f)
+        manifest['vendor'][key] = f"vendor/{filename}"
+    # Quitar entradas que este script ya no genera (p. ej. el decodificador de meshopt)
+    manifest['vendor'] = {key: path for key, path in manifest['vendor'].items() if key in VENDOR_FILES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="*", help="Rutas .glb relativas a la raíz del repo (como en MODEL_MAP)")
+    parser.add_argument("--force", action="store_true", help="Regenerar aunque no haya cambios")
+    parser.add_argument("--vendor", action="store_true", help="Descargar el script de model-viewer")
+    parser.add_argument("--static-dir", default=STATIC_DIR, help="Carpeta servida en /app/static (por defecto static/)")
+    args = parser.parse_args()
+
+    sources = args.sources or sorted(
+        os.path.relpath(p, REPO_ROOT)
+        for pattern in ("modelos_3d/*.glb", "*.glb")
+        for p in glob.glob(os.path.join(REPO_ROOT, pattern))
+    )
+    manifest_path = os.path.join(args.static_dir, "modelos_3d", "manifest.json")
+    manifest = load_manifest(manifest_path)
+    manifest.setdefault('models', {})
+    manifest.setdefault('vendor', {})
+
+    if args.vendor:
+        vendor_scripts(manifest, args.static_dir)
+
+    if not sources and not args.vendor:
+        print("No se encontraron modelos .glb.")
+        return 1
+    if sources and meshoptimizer is None:
+        print("Falta meshoptimizer (pip install meshoptimizer).")
+        return 1
+    for source_rel in sources:
+        source_rel = os.path.relpath(os.path.abspath(source_rel), REPO_ROOT).replace(os.sep, "/")
+        manifest['models'][source_rel] = build_model(source_rel, manifest, args.static_dir, force=args.force)
+
+    save_manifest(manifest_path, manifest)
+    print(f"Manifiesto: {manifest_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())